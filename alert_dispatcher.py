@@ -0,0 +1,120 @@
+# alert_dispatcher.py
+# -*- coding: utf-8 -*-
+"""
+תור התראות חסום + מאגר workers. ת'רד הטיקים רק מכניס עבודה לתור (O(1), בלי רשת);
+חדשות, בניית הודעה ושליחה לטלגרם קורים ב-workers.
+Backpressure לפי מפתח (למשל סימול + סוג התראה):
+  merge – התראה חדשה מחליפה את הממתינה עם אותו מפתח (נשמר המקום בתור, נשלח המידע העדכני)
+  drop  – אם כבר ממתינה התראה עם אותו מפתח, החדשה נזרקת
+כשהתור מלא – ההתראה החדשה נזרקת ונספרת.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from config import ALERT_WORKERS, ALERT_QUEUE_MAX
+from telemetry import Gauge
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+class AlertDispatcher:
+    def __init__(self, workers: int = ALERT_WORKERS, maxsize: int = ALERT_QUEUE_MAX):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._pending: OrderedDict = OrderedDict()   # {key: _Job} לפי סדר הכניסה
+        self._cond = threading.Condition()
+        self._started = False
+        self.submitted = 0
+        self.dispatched = 0
+        self.failed = 0
+        self.merged = 0
+        self.dropped = 0
+        self.last_latency_sec = 0.0
+        self.max_latency_sec = 0.0
+        self._latency_sum = 0.0
+
+    def _start_locked(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"alert-{i}", daemon=True).start()
+        self._started = True
+
+    def submit(self, key, fn, *args, policy: str = "merge", **kwargs) -> bool:
+        """מכניס התראה לתור. מחזיר False אם נזרקה (תור מלא / policy=drop)."""
+        job = _Job(fn, args, kwargs)
+        with self._cond:
+            if not self._started:
+                self._start_locked()
+            self.submitted += 1
+            if key in self._pending:
+                if policy == "drop":
+                    self.dropped += 1
+                    return False
+                job.enqueued_at = self._pending[key].enqueued_at   # הלטנסי נמדד מההתראה הראשונה
+                self._pending[key] = job
+                self.merged += 1
+                return True
+            if len(self._pending) >= self.maxsize:
+                self.dropped += 1
+                logging.warning("alert queue full (%d) – dropping %s", self.maxsize, key)
+                return False
+            self._pending[key] = job
+            self._cond.notify()
+            return True
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key, job = self._pending.popitem(last=False)
+            trace = job.kwargs.get("trace")
+            if trace is not None:
+                trace.mark_dequeue()          # מכאן ההתראה כבר לא ממתינה בתור (alert_trace)
+            try:
+                job.fn(*job.args, **job.kwargs)
+                ok = True
+            except Exception as e:
+                ok = False
+                logging.error("alert dispatch failed for %s: %s", key, e)
+            latency = time.monotonic() - job.enqueued_at
+            with self._cond:
+                if ok:
+                    self.dispatched += 1
+                else:
+                    self.failed += 1
+                self.last_latency_sec = latency
+                self.max_latency_sec = max(self.max_latency_sec, latency)
+                self._latency_sum += latency
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        with self._cond:
+            done = self.dispatched + self.failed
+            return {
+                "depth": len(self._pending),
+                "submitted": self.submitted,
+                "dispatched": self.dispatched,
+                "failed": self.failed,
+                "merged": self.merged,
+                "dropped": self.dropped,
+                "avg_latency_sec": round(self._latency_sum / done, 3) if done else None,
+                "max_latency_sec": round(self.max_latency_sec, 3),
+            }
+
+dispatcher = AlertDispatcher()
+
+def submit_alert(key, fn, *args, **kwargs) -> bool:
+    return dispatcher.submit(key, fn, *args, **kwargs)
+
+Gauge("moneybot_alert_queue_depth", "Alerts waiting in the dispatch queue", fn=lambda: {(): dispatcher.depth()})
+Gauge("moneybot_alerts_total", "Alert dispatcher counters", ("event",), kind="counter",
+      fn=lambda: {(k,): v for k, v in dispatcher.stats().items() if k in ("submitted", "dispatched", "failed", "merged", "dropped")})
@@ -0,0 +1,50 @@
+# alert_routing.py
+# -*- coding: utf-8 -*-
+"""
+ניתוב התראות לפי העדפות מנוי: אינדקס (alert_type, symbol, tier) → chat_ids.
+מנוי בלי רשימת טיקרים נרשם תחת symbol="*". טווח מחירים נבדק רק על המנויים
+שכבר התאימו, כך שעלות הניתוב היא O(מנויים מתאימים) ולא O(כל המנויים).
+"""
+
+ALERT_TYPES = ("FULL", "HEADS_UP", "VWAP", "VOLUME", "HOD")
+TIERS       = ("A", "B")
+ANY_SYMBOL  = "*"
+
+def split_csv(value: str | None) -> tuple[str, ...]:
+    return tuple(v.strip().upper() for v in (value or "").split(",") if v.strip())
+
+class RoutingIndex:
+    """
+    subs – רשומות {chat_id, tiers, alert_types, tickers, min_price, max_price};
+    שדה None/ריק = "הכל".
+    """
+
+    def __init__(self, subs: list[dict]):
+        self._idx: dict[tuple[str, str, str], list[str]] = {}
+        self._bands: dict[str, tuple[float, float]] = {}
+        self.all_chats: tuple[str, ...] = tuple(s["chat_id"] for s in subs)
+
+        for s in subs:
+            chat = s["chat_id"]
+            types = split_csv(s.get("alert_types")) or ALERT_TYPES
+            tiers = split_csv(s.get("tiers")) or TIERS
+            symbols = split_csv(s.get("tickers")) or (ANY_SYMBOL,)
+            for t in types:
+                for tier in tiers:
+                    for sym in symbols:
+                        self._idx.setdefault((t, sym, tier), []).append(chat)
+            lo, hi = s.get("min_price"), s.get("max_price")
+            if lo is not None or hi is not None:
+                self._bands[chat] = (lo if lo is not None else 0.0, hi if hi is not None else float("inf"))
+
+    def route(self, alert_type: str, symbol: str, tier: str | None, price: float | None = None) -> list[str]:
+        tiers = (tier,) if tier else TIERS
+        out: dict[str, None] = {}
+        for tr in tiers:
+            for sym in (ANY_SYMBOL, symbol):
+                for chat in self._idx.get((alert_type, sym, tr), ()):
+                    out[chat] = None
+        if price is None or not self._bands:
+            return list(out)
+        bands = self._bands
+        return [c for c in out if c not in bands or bands[c][0] <= price <= bands[c][1]]
@@ -0,0 +1,102 @@
+# alert_trace.py
+# -*- coding: utf-8 -*-
+"""
+מעקב לטנסי לכל התראה – מהטרייד בבורסה ועד כל מסירה בטלגרם:
+  exchange (t של Finnhub) → recv (קבלה מה-socket) → eval (חוק הופעל) → dequeue (worker לקח מהתור)
+  → prep (המלצה/עיבוד עד שליפת החדשות) → news → render → delivery×N
+כל שלב נמדד כהפרש מהשלב הקודם שנמדד בפועל, ונחשף ב-/metrics כהיסטוגרמה וכאחוזונים
+(p50/p90/p99 על ההתראות האחרונות). הערה: exchange→recv תלוי בסנכרון השעון מול Finnhub.
+"""
+import time
+import threading
+from collections import deque
+from telemetry import Histogram, Gauge
+
+STAGES = ("feed", "eval", "queue", "prep", "news", "render", "delivery", "end_to_end")
+RECENT_TRACES = 1000
+
+ALERT_LATENCY = Histogram("moneybot_alert_latency_seconds", "Alert latency per stage", ("stage",))
+
+_recent: dict[str, deque] = {s: deque(maxlen=RECENT_TRACES) for s in STAGES}
+_recent_lock = threading.Lock()
+
+class AlertTrace:
+    __slots__ = ("kind", "symbol", "exchange_ts", "recv_ts", "eval_ts", "dequeue_ts", "news_start_ts", "news_ts",
+                 "render_ts", "deliveries")
+
+    def __init__(self, kind: str, symbol: str, exchange_ts: float | None = None, recv_ts: float | None = None):
+        self.kind = kind
+        self.symbol = symbol
+        self.exchange_ts = exchange_ts     # epoch שניות (t של הטרייד / 1000)
+        self.recv_ts = recv_ts
+        self.eval_ts = time.time()         # הטרייס נוצר ברגע שהחוק הופעל
+        self.dequeue_ts = None             # alert_dispatcher – worker התחיל את העבודה
+        self.news_start_ts = None
+        self.news_ts = None
+        self.render_ts = None
+        self.deliveries: list[float] = []
+
+    def mark_dequeue(self):
+        self.dequeue_ts = time.time()
+
+    def mark_news_start(self):
+        self.news_start_ts = time.time()
+
+    def mark_news(self):
+        self.news_ts = time.time()
+
+    def mark_render(self):
+        self.render_ts = time.time()
+
+    def mark_delivery(self):
+        self.deliveries.append(time.time())   # list.append אטומי – נקרא מת'רדי השליחה
+
+    def origin(self) -> float:
+        return self.exchange_ts or self.recv_ts or self.eval_ts
+
+    def lag_sec(self) -> float:
+        """מהטרייד (או מהקבלה) עד עכשיו – לשורת הפוטר."""
+        return time.time() - self.origin()
+
+    def stages(self) -> dict:
+        """{stage: seconds} – כל שלב מסתיים בנקודה שלו ומתחיל בנקודה הקודמת שנמדדה."""
+        points = [(None, self.exchange_ts), ("feed", self.recv_ts), ("eval", self.eval_ts),
+                  ("queue", self.dequeue_ts), ("prep", self.news_start_ts), ("news", self.news_ts),
+                  ("render", self.render_ts)]
+        out = {}
+        prev = None
+        for stage, ts in points:
+            if ts is None:
+                continue
+            if prev is not None:
+                out[stage] = ts - prev
+            prev = ts
+        if self.deliveries:
+            out["delivery"] = [d - prev for d in self.deliveries]
+            out["end_to_end"] = max(self.deliveries) - self.origin()
+        return out
+
+    def finish(self):
+        """נקרא אחרי שכל המסירות הסתיימו – רושם את השלבים במדדים."""
+        stages = self.stages()
+        with _recent_lock:
+            for stage, v in stages.items():
+                for x in (v if isinstance(v, list) else (v,)):
+                    ALERT_LATENCY.observe(stage, value=x)
+                    _recent[stage].append(x)
+
+def latency_summary() -> dict:
+    """{stage: {"p50", "p90", "p99", "n"}} על RECENT_TRACES ההתראות האחרונות (שניות)."""
+    out = {}
+    with _recent_lock:
+        snap = {s: sorted(d) for s, d in _recent.items() if d}
+    for stage, vals in snap.items():
+        n = len(vals)
+        out[stage] = {f"p{p}": round(vals[min(n - 1, int(round(p / 100.0 * (n - 1))))], 4) for p in (50, 90, 99)}
+        out[stage]["n"] = n
+    return out
+
+Gauge("moneybot_alert_latency_quantile_seconds", "Alert latency percentiles over the most recent alerts",
+      ("stage", "quantile"),
+      fn=lambda: {(stage, str(int(q[1:]) / 100)): v for stage, qs in latency_summary().items()
+                  for q, v in qs.items() if q != "n"})
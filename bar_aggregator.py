@@ -0,0 +1,100 @@
+# bar_aggregator.py
+# -*- coding: utf-8 -*-
+"""
+בניית נרות 1ד' (OHLCV + VWAP) מטריידים של ה-WebSocket, לכל סימול, בתוך התהליך.
+on_message מזין כל טרייד; מאזינים (metrics) מקבלים את הנר שנבנה בכל עדכון,
+ואת הנר הקודם כשהדקה מתחלפת (closed=True).
+נר נסגר "בעצלות" – כשמגיע טרייד מדקה מאוחרת יותר. דקה בלי טריידים פשוט לא מופיעה
+(כמו ב-REST candles של Finnhub).
+"""
+import logging
+import threading
+
+BAR_SEC = 60
+
+class Bar:
+    __slots__ = ("t", "o", "h", "l", "c", "v", "pv", "trades")
+
+    def __init__(self, t: int, price: float, volume: float):
+        self.t = t                    # תחילת הדקה (epoch שניות)
+        self.o = self.h = self.l = self.c = price
+        self.v = volume
+        self.pv = price * volume      # Σ price·volume – ל-VWAP אמיתי של הנר
+        self.trades = 1
+
+    def add(self, price: float, volume: float):
+        if price > self.h: self.h = price
+        if price < self.l: self.l = price
+        self.c = price
+        self.v += volume
+        self.pv += price * volume
+        self.trades += 1
+
+    @property
+    def vwap(self) -> float:
+        return self.pv / self.v if self.v > 0 else self.c
+
+    def __repr__(self):
+        return f"Bar(t={self.t}, o={self.o}, h={self.h}, l={self.l}, c={self.c}, v={self.v})"
+
+class BarAggregator:
+    def __init__(self, bar_sec: int = BAR_SEC):
+        self.bar_sec = bar_sec
+        self._bars: dict[str, Bar] = {}          # {symbol: הנר שנבנה כרגע}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.trades = 0
+        self.closed = 0
+        self.late = 0                            # טריידים מדקה שכבר נסגרה (נזרקים)
+
+    def add_listener(self, fn):
+        """
+        fn(symbol, bar, closed, trade_ts, recv_ts) – נקרא מת'רד ה-WebSocket, חייב להיות קצר.
+        trade_ts/recv_ts – זמן הטרייד שגרם לעדכון (בבורסה / קבלה מה-socket), גם כשהוא סוגר נר קודם.
+        """
+        self._listeners.append(fn)
+
+    def add_trade(self, symbol: str, ts: float, price: float, volume: float, recv_ts: float | None = None):
+        """
+        ts = זמן הטרייד (epoch שניות), recv_ts = מתי הפריים התקבל (ל-trace של התראות).
+        מחזיר את הנר שנסגר אם הדקה התחלפה, אחרת None.
+        """
+        t = int(ts) // self.bar_sec * self.bar_sec
+        closed_bar = None
+        with self._lock:
+            self.trades += 1
+            bar = self._bars.get(symbol)
+            if bar is None or t > bar.t:
+                if bar is not None:
+                    closed_bar = bar
+                    self.closed += 1
+                bar = self._bars[symbol] = Bar(t, price, volume)
+            elif t == bar.t:
+                bar.add(price, volume)
+            else:
+                self.late += 1
+                return None
+        for fn in self._listeners:
+            try:
+                if closed_bar is not None:
+                    fn(symbol, closed_bar, True, ts, recv_ts)
+                fn(symbol, bar, False, ts, recv_ts)
+            except Exception as e:
+                logging.error("bar listener error for %s: %s", symbol, e)
+        return closed_bar
+
+    def current(self, symbol: str) -> Bar | None:
+        with self._lock:
+            return self._bars.get(symbol)
+
+    def drop(self, symbol: str):
+        """סימול שיצא מרשימת המעקב."""
+        with self._lock:
+            self._bars.pop(symbol, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"symbols": len(self._bars), "trades": self.trades,
+                    "closed_bars": self.closed, "late_trades": self.late}
+
+aggregator = BarAggregator()
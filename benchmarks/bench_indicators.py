@@ -0,0 +1,135 @@
+# benchmarks/bench_indicators.py
+# -*- coding: utf-8 -*-
+"""
+השוואת מנוע האינדיקטורים הווקטורי (indicators.py) מול החישוב הסימול-אחר-סימול של stock_fetcher,
+על נרות יומיים סינתטיים בגודל יקום מלא. בודק גם שהתוצאות זהות ביט-לביט.
+הזהות נבדקת מול אותה סכימה בשני הצדדים: sum() בצד הסקלרי מוחלף בסכום משמאל לימין
+(זהה ל-sum() עד 3.11; מ-3.12 sum() מפצה שגיאה ונבדל בביט האחרון). דורש requirements-dev.txt.
+
+    python benchmarks/bench_indicators.py [--symbols 8000] [--days 35] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import stock_fetcher
+import indicators
+
+def _seq_sum(values) -> float:
+    """סכום משמאל לימין – סדר הפעולות של indicators._seq_sum (ושל sum() עד 3.11)."""
+    acc = 0
+    for x in values:
+        acc = acc + x
+    return acc
+
+def _synthetic_daily(rng: random.Random, days: int) -> dict | None:
+    """נרות יומיים אקראיים בסגנון Finnhub; חלק מהסימולים קצרים מדי או חסרים (כמו במציאות)."""
+    r = rng.random()
+    if r < 0.02:
+        return None
+    if r < 0.05:
+        days = rng.randint(1, 14)
+    px = rng.uniform(0.3, 15.0)
+    o, h, l, c, v = [], [], [], [], []
+    for _ in range(days):
+        op = px * rng.uniform(0.9, 1.1)
+        cl = op * rng.uniform(0.85, 1.2)
+        o.append(op); c.append(cl)
+        h.append(max(op, cl) * rng.uniform(1.0, 1.1))
+        l.append(min(op, cl) * rng.uniform(0.9, 1.0))
+        v.append(rng.randint(10_000, 50_000_000))
+        px = cl
+    return {"s": "ok", "o": o, "h": h, "l": l, "c": c, "v": v}
+
+def _synthetic_entry(rng: random.Random, symbol: str) -> dict:
+    return {
+        "symbol": symbol,
+        "short_float": rng.choice([None, rng.uniform(0, 40)]),
+        "gap_pct": rng.choice([None, rng.uniform(-10, 60)]),
+        "momentum_from_open_pct": rng.uniform(-10, 20),
+        "intraday_volume": rng.randint(50_000, 20_000_000),
+    }
+
+def _scalar(entries: list, daily: dict) -> list:
+    """החישוב הקיים של שלב 2 – סימול אחר סימול (אותו קוד כמו _stage2_deep_filters)."""
+    out = []
+    for e in entries:
+        e = dict(e)
+        sym = e["symbol"]
+        adv = stock_fetcher._avg_dollar_volume_10d(sym)
+        atr = stock_fetcher._atr_percent(sym, days=30)
+        d = daily[sym]
+        avg_units = None
+        if d:
+            vols = d.get("v") or []
+            if len(vols) >= 10:
+                avg_units = _seq_sum(vols[-10:]) / 10.0
+        rvol = e["intraday_volume"] / avg_units if avg_units and avg_units > 0 else None
+        e.update({
+            "avg_dollar_vol_10d": float(adv) if adv else None,
+            "atr_pct": float(atr) if atr is not None else None,
+            "rvol": float(rvol) if rvol is not None else None,
+        })
+        e["score"] = stock_fetcher._score(e)
+        out.append(e)
+    return out
+
+def _vector(entries: list, daily: dict) -> list:
+    batch = [dict(e) for e in entries]
+    return indicators.compute_stage2_batch(batch, [daily[e["symbol"]] for e in batch])
+
+def _best_of(fn, repeat: int) -> tuple[float, list]:
+    best, res = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=8000)
+    ap.add_argument("--days", type=int, default=35)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    daily = {s: _synthetic_daily(rng, args.days) for s in symbols}
+    entries = [_synthetic_entry(rng, s) for s in symbols]
+    # הפונקציות של stock_fetcher קוראות נרות דרך _get_daily_candles – מזינים אותן מהנתונים הסינתטיים
+    stock_fetcher._get_daily_candles = lambda symbol, days=35: daily[symbol]
+    stock_fetcher.sum = _seq_sum   # מסתיר את ה-builtin רק בתוך המודול, רק בריצת ה-benchmark
+
+    t_scalar, ref = _best_of(lambda: _scalar(entries, daily), args.repeat)
+    t_vector, got = _best_of(lambda: _vector(entries, daily), args.repeat)
+    # רק החישוב, על נרות שכבר מוערמים (כשהאצווה נשמרת כמערכים – למשל בין סריקות)
+    stack = indicators.stack_daily([daily[s] for s in symbols])
+    iv = [e["intraday_volume"] for e in entries]
+    sf, gap, mom = (indicators._column(entries, k) for k in ("short_float", "gap_pct", "momentum_from_open_pct"))
+    def _compute():
+        adv, atr = indicators.avg_dollar_volume(stack), indicators.atr_percent(stack)
+        rv = indicators.rvol(iv, indicators.avg_volume(stack))
+        return indicators.score_batch(sf, rv, gap, atr, adv, mom)
+    t_compute, _ = _best_of(_compute, args.repeat)
+
+    keys = ("avg_dollar_vol_10d", "atr_pct", "rvol", "score")
+    mismatches = [(a["symbol"], k, a[k], b[k]) for a, b in zip(ref, got) for k in keys if a[k] != b[k]]
+
+    print(f"symbols={args.symbols} days={args.days} (best of {args.repeat})")
+    print(f"  scalar : {t_scalar * 1000:9.1f} ms  ({t_scalar / args.symbols * 1e6:.1f} µs/symbol)")
+    print(f"  vector : {t_vector * 1000:9.1f} ms  ({t_vector / args.symbols * 1e6:.1f} µs/symbol)")
+    print(f"  speedup: {t_scalar / t_vector:.1f}x (including list → array stacking)")
+    print(f"  vector compute only (pre-stacked): {t_compute * 1000:.1f} ms  → {t_scalar / t_compute:.1f}x")
+    print(f"  bit-identical: {'yes' if not mismatches else 'NO'} ({len(mismatches)} mismatches)")
+    for m in mismatches[:10]:
+        print("   ", m)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
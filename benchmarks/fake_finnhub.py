@@ -0,0 +1,394 @@
+# benchmarks/fake_finnhub.py
+# -*- coding: utf-8 -*-
+"""
+שרת דמה מקומי ל-Finnhub – REST + זרם טריידים ב-WebSocket על אותו פורט, בלי תלויות חיצוניות.
+נתונים סינתטיים ודטרמיניסטיים לכל סימול (seed מהטיקר), השהיה מוזרקת ותשובות 429.
+
+    python benchmarks/fake_finnhub.py --port 8765 --universe 10000 --latency-ms 40 --rate-per-min 600
+
+ואז:
+    FINNHUB_REST_URL=http://127.0.0.1:8765/api/v1 FINNHUB_WS_URL=ws://127.0.0.1:8765 python main.py
+
+Endpoints: /stock/symbol, /quote, /stock/profile2, /stock/metric, /stock/candle, /company-news,
+/_stats (מוני קריאות), ו-Upgrade: websocket על כל נתיב (subscribe/unsubscribe כמו ב-Finnhub).
+"""
+import json
+import time
+import zlib
+import base64
+import random
+import socket
+import struct
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = "/api/v1"
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TICK_BATCH_SEC = 0.05
+EXCLUDED_SHARE = 0.05          # חלק מהיקום עם תיאור WARRANT/UNIT (נסנן ב-symbol_universe)
+
+# ===== נתונים סינתטיים =====
+def _rng(symbol: str, salt) -> random.Random:
+    return random.Random(zlib.crc32(f"{symbol}:{salt}".encode()))
+
+def _ticker(i: int) -> str:
+    s = ""
+    i += 26 * 27                               # מתחילים מטיקרים של 3 אותיות
+    while i:
+        i, r = divmod(i, 26)
+        s = chr(65 + r) + s
+    return s
+
+class Market:
+    """מודל השוק: יקום, מחירי בסיס וציטוטים יציבים לכל סימול, ומחיר חי שזז עם הטריידים."""
+
+    def __init__(self, universe: int, seed: int = 1):
+        self.symbols = [_ticker(i) for i in range(universe)]
+        self.seed = seed
+        self._live: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def base_price(self, sym: str) -> float:
+        r = _rng(sym, ("px", self.seed))
+        return round(r.uniform(0.3, 15.0) if r.random() < 0.5 else r.uniform(15.0, 300.0), 4)
+
+    def symbol_list(self) -> list[dict]:
+        out = []
+        for sym in self.symbols:
+            r = _rng(sym, ("sym", self.seed))
+            desc = f"{sym} INC"
+            if r.random() < EXCLUDED_SHARE:
+                desc = f"{sym} {r.choice(['WARRANT', 'UNIT', 'PREFERRED'])}"
+            out.append({"symbol": sym, "displaySymbol": sym, "description": desc, "type": "Common Stock"})
+        return out
+
+    def quote(self, sym: str) -> dict:
+        base = self.base_price(sym)
+        r = _rng(sym, ("quote", self.seed))
+        gap = r.uniform(-0.05, 0.35)
+        o = round(base, 4)
+        pc = round(o / (1.0 + gap), 4)
+        c = round(self.live_price(sym), 4)
+        return {"c": c, "o": o, "pc": pc, "h": max(o, c), "l": min(o, c), "t": int(time.time())}
+
+    def profile(self, sym: str) -> dict:
+        r = _rng(sym, ("profile", self.seed))
+        # כמו ב-Finnhub: marketCapitalization במיליוני דולר
+        return {"ticker": sym, "name": f"{sym} Inc", "marketCapitalization": round(r.uniform(5, 5000), 2)}
+
+    def metric(self, sym: str) -> dict:
+        r = _rng(sym, ("metric", self.seed))
+        return {"symbol": sym, "metric": {"shortInterestPercentFloat": round(r.uniform(0.0, 40.0), 2)}}
+
+    def candles(self, sym: str, resolution: str, ts_from: int, ts_to: int) -> dict:
+        step = {"1": 60, "5": 300, "15": 900, "60": 3600, "D": 86400}.get(resolution, 60)
+        now = int(time.time())
+        ts_to = min(ts_to, now)
+        base = self.base_price(sym)
+        t = (ts_from + step - 1) // step * step
+        out = {"t": [], "o": [], "h": [], "l": [], "c": [], "v": []}
+        while t <= ts_to and len(out["t"]) < 5000:
+            if step == 86400 and datetime.fromtimestamp(t, timezone.utc).weekday() >= 5:
+                t += step
+                continue
+            r = _rng(sym, (resolution, t, self.seed))
+            o = base * r.uniform(0.9, 1.1)
+            c = o * r.uniform(0.92, 1.1)
+            vol_scale = {86400: 2_000_000, 3600: 200_000, 900: 50_000, 300: 20_000}.get(step, 5_000)
+            out["t"].append(t)
+            out["o"].append(round(o, 4)); out["c"].append(round(c, 4))
+            out["h"].append(round(max(o, c) * r.uniform(1.0, 1.05), 4))
+            out["l"].append(round(min(o, c) * r.uniform(0.95, 1.0), 4))
+            out["v"].append(int(vol_scale * r.uniform(0.2, 3.0)))
+            t += step
+        if not out["t"]:
+            return {"s": "no_data"}
+        out["s"] = "ok"
+        return out
+
+    def news(self, sym: str) -> list[dict]:
+        r = _rng(sym, ("news", self.seed, datetime.utcnow().date().isoformat()))
+        words = ["surges", "falls", "announces offering", "beats estimates", "misses", "partners with", "FDA approval"]
+        return [{"headline": f"{sym} {r.choice(words)}", "datetime": int(time.time()), "source": "fake"}
+                for _ in range(r.randint(0, 3))]
+
+    def live_price(self, sym: str) -> float:
+        with self._lock:
+            p = self._live.get(sym)
+            if p is None:
+                p = self._live[sym] = self.base_price(sym)
+            return p
+
+    def trade(self, sym: str, r: random.Random) -> dict:
+        with self._lock:
+            p = self._live.get(sym) or self.base_price(sym)
+            p = max(0.01, p * r.uniform(0.996, 1.0055))    # הליכה אקראית עם סחף קל למעלה
+            self._live[sym] = p
+        return {"s": sym, "p": round(p, 4), "t": int(time.time() * 1000), "v": r.randint(1, 2000), "c": None}
+
+# ===== הגבלת קצב (כמו המכסה של Finnhub) =====
+class _Quota:
+    def __init__(self, per_min: int):
+        self.rate = per_min / 60.0
+        self.cap = max(1.0, per_min / 6.0)
+        self.tokens = self.cap
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.cap, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+# ===== WebSocket מינימלי (RFC 6455, צד שרת) =====
+def _ws_send(wfile, lock, payload: bytes, opcode: int = 0x1):
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    with lock:
+        wfile.write(head + payload)
+
+def _ws_recv(rfile):
+    """(opcode, payload) או None בסגירת חיבור."""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    b1, b2 = head
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if b2 & 0x80 else None
+    data = rfile.read(n)
+    if mask:
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return b1 & 0x0F, data
+
+# ===== השרת =====
+class FakeFinnhub:
+    def __init__(self, host="127.0.0.1", port=0, universe=10_000, latency_ms=0.0, jitter_ms=0.0,
+                 rate_per_min=0, error_rate=0.0, ticks_per_sec=200.0, seed=1):
+        self.market = Market(universe, seed)
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.quota = _Quota(rate_per_min)
+        self.error_rate = error_rate
+        self.ticks_per_sec = ticks_per_sec
+        self.calls: dict[str, int] = {}
+        self.throttled = 0
+        self.ws_connections = 0
+        self.ticks_sent = 0
+        self._stats_lock = threading.Lock()
+        self._symbols_cache = None
+        self._rng = random.Random(seed)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.httpd.server_address[0]}:{self.port}{API_PREFIX}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.httpd.server_address[0]}:{self.port}"
+
+    def start(self) -> "FakeFinnhub":
+        threading.Thread(target=self.httpd.serve_forever, name="fake-finnhub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"calls": dict(self.calls), "total_calls": sum(self.calls.values()),
+                    "throttled": self.throttled, "ws_connections": self.ws_connections,
+                    "ticks_sent": self.ticks_sent}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _route(self, path: str, q: dict):
+        sym = q.get("symbol", "")
+        m = self.market
+        if path == "/stock/symbol":
+            if self._symbols_cache is None:
+                self._symbols_cache = json.dumps(m.symbol_list()).encode()
+            return self._symbols_cache
+        if path == "/quote":
+            return m.quote(sym)
+        if path == "/stock/profile2":
+            return m.profile(sym)
+        if path == "/stock/metric":
+            return m.metric(sym)
+        if path == "/stock/candle":
+            return m.candles(sym, q.get("resolution", "1"), int(q.get("from", 0)), int(q.get("to", 0)))
+        if path == "/company-news":
+            return m.news(sym)
+        return None
+
+    def _ws_session(self, handler):
+        wlock = threading.Lock()
+        subscribed: set[str] = set()
+        alive = threading.Event()
+        alive.set()
+        with self._stats_lock:
+            self.ws_connections += 1
+
+        def pump():
+            r = random.Random(self._rng.random())
+            per_batch = self.ticks_per_sec * TICK_BATCH_SEC
+            carry = 0.0
+            while alive.is_set():
+                time.sleep(TICK_BATCH_SEC)
+                syms = list(subscribed)
+                if not syms:
+                    continue
+                carry += per_batch
+                n, carry = int(carry), carry - int(carry)
+                if n == 0:
+                    continue
+                data = [self.market.trade(r.choice(syms), r) for _ in range(n)]
+                try:
+                    _ws_send(handler.wfile, wlock, json.dumps({"type": "trade", "data": data}).encode())
+                except OSError:
+                    alive.clear()
+                    return
+                with self._stats_lock:
+                    self.ticks_sent += n
+
+        threading.Thread(target=pump, name="fake-ws-pump", daemon=True).start()
+        try:
+            while alive.is_set():
+                frame = _ws_recv(handler.rfile)
+                if frame is None:
+                    break
+                op, data = frame
+                if op == 0x8:                                  # close
+                    _ws_send(handler.wfile, wlock, data[:2], opcode=0x8)
+                    break
+                if op == 0x9:                                  # ping → pong
+                    _ws_send(handler.wfile, wlock, data, opcode=0xA)
+                    continue
+                if op != 0x1:
+                    continue
+                try:
+                    msg = json.loads(data)
+                except ValueError:
+                    continue
+                sym = msg.get("symbol")
+                if msg.get("type") == "subscribe" and sym:
+                    subscribed.add(sym)
+                elif msg.get("type") == "unsubscribe" and sym:
+                    subscribed.discard(sym)
+        except (OSError, struct.error):
+            pass
+        finally:
+            alive.clear()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _json(self, code: int, body, headers: dict | None = None):
+                raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                if self.headers.get("Upgrade", "").lower() == "websocket":
+                    key = self.headers.get("Sec-WebSocket-Key", "")
+                    accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+                    self.send_response(101, "Switching Protocols")
+                    self.send_header("Upgrade", "websocket")
+                    self.send_header("Connection", "Upgrade")
+                    self.send_header("Sec-WebSocket-Accept", accept)
+                    self.end_headers()
+                    self.wfile.flush()
+                    self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    server._ws_session(self)
+                    self.close_connection = True
+                    return
+
+                url = urlparse(self.path)
+                if url.path == "/_stats":
+                    return self._json(200, server.stats())
+                path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                server._count(path)
+
+                if server.latency or server.jitter:
+                    time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+                if not server.quota.allow() or (server.error_rate and random.random() < server.error_rate):
+                    with server._stats_lock:
+                        server.throttled += 1
+                    return self._json(429, {"error": "API limit reached"}, {"Retry-After": "1"})
+                try:
+                    body = server._route(path, q)
+                except Exception as e:
+                    logging.error("fake finnhub error on %s: %s", self.path, e)
+                    return self._json(500, {"error": str(e)})
+                if body is None:
+                    return self._json(404, {"error": "unknown endpoint"})
+                return self._json(200, body)
+
+        return Handler
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Finnhub REST + WebSocket stand-in")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--universe", type=int, default=10_000)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--rate-per-min", type=int, default=0, help="quota; 0 = unlimited")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of random 429s")
+    ap.add_argument("--ticks-per-sec", type=float, default=200.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    srv = FakeFinnhub(args.host, args.port, args.universe, args.latency_ms, args.jitter_ms,
+                      args.rate_per_min, args.error_rate, args.ticks_per_sec, args.seed).start()
+    logging.info("fake finnhub on %s (REST) / %s (WS)", srv.rest_url, srv.ws_url)
+    try:
+        while True:
+            time.sleep(30)
+            logging.info("stats: %s", srv.stats())
+    except KeyboardInterrupt:
+        srv.stop()
+
+if __name__ == "__main__":
+    main()
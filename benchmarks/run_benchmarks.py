@@ -0,0 +1,210 @@
+# benchmarks/run_benchmarks.py
+# -*- coding: utf-8 -*-
+"""
+חבילת benchmark מול שרת הדמה (fake_finnhub) – בלי מכסת API אמיתית ובלי טלגרם:
+  scan    – get_microcap_symbols: זמן קיר, קריאות API לכל סימול שנבחר, 429s
+  ticks   – start_websocket מול זרם הטריידים: תפוקת טיקים, לטנסי טיק→התראה (תור ומסירה)
+  metrics – start_metrics: קריאות candle וטריות לסימול
+התוצאות נשמרות כ-JSON (benchmarks/results/) להשוואה לאורך זמן.
+
+    python benchmarks/run_benchmarks.py --universe 2000 --latency-ms 20 --ticks-per-sec 500 --duration 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_finnhub import FakeFinnhub
+
+def _percentiles(vals: list, ps=(50, 90, 99)) -> dict:
+    if not vals:
+        return {}
+    s = sorted(vals)
+    out = {f"p{p}": round(s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))] * 1000, 2) for p in ps}
+    out["max"] = round(s[-1] * 1000, 2)
+    return out
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def _configure_env(srv: FakeFinnhub, workdir: str, calls_per_min: int, ws_shards: int):
+    """חייב לרוץ לפני import של מודולי הבוט – config קורא את הסביבה בטעינה."""
+    os.environ.update({
+        "FINNHUB_REST_URL": srv.rest_url,
+        "FINNHUB_WS_URL": srv.ws_url,
+        "FINNHUB_API_KEY": "bench",
+        "FINNHUB_CALLS_PER_MIN": str(calls_per_min),
+        "CACHE_DB_PATH": os.path.join(workdir, "bot_cache.db"),
+        "SUBSCRIBERS_DB": os.path.join(workdir, "subscribers.db"),
+        "WS_RECORD_PATH": "",
+        "WS_SHARDS": str(ws_shards),
+    })
+
+def _fake_send(message, alert_type=None, symbol=None, tier=None, price=None, trace=None):
+    """במקום טלגרם: "מסירה" מיידית – כך שה-trace של ההתראה נסגר ונמדד."""
+    if trace is not None:
+        trace.mark_delivery()
+        trace.finish()
+    return {"sent": [], "failed": {}, "elapsed_sec": 0.0}
+
+def bench_scan(srv: FakeFinnhub, limit: int) -> tuple[dict, list]:
+    import stock_fetcher
+    before = srv.stats()
+    t0 = time.perf_counter()
+    selected = stock_fetcher.get_microcap_symbols(limit=limit)
+    wall = time.perf_counter() - t0
+    after = srv.stats()
+    calls = {k: after["calls"].get(k, 0) - before["calls"].get(k, 0) for k in after["calls"]}
+    total = sum(calls.values())
+    return {
+        "wall_sec": round(wall, 2),
+        "selected": len(selected),
+        "api_calls": total,
+        "api_calls_by_endpoint": calls,
+        "api_calls_per_selected": round(total / len(selected), 1) if selected else None,
+        "throttled_429": after["throttled"] - before["throttled"],
+    }, selected
+
+def bench_ticks(srv: FakeFinnhub, watchlist: list, duration: float) -> dict:
+    import websocket_handler
+    from alert_trace import latency_summary
+
+    recv = {"ticks": 0, "frames": 0, "busy": 0.0, "t": 0.0}
+    enqueue_lat, deliver_lat = [], []
+    delivered = {"n": 0}
+
+    orig_on_message = websocket_handler.on_message
+    orig_submit = websocket_handler.submit_alert
+
+    def on_message(ws, message):
+        recv["t"] = t0 = time.perf_counter()
+        orig_on_message(ws, message)
+        recv["busy"] += time.perf_counter() - t0
+        recv["frames"] += 1
+        recv["ticks"] += message.count('"s":')
+
+    def submit(key, fn, *args, **kwargs):
+        t_recv = recv["t"]
+        enqueue_lat.append(time.perf_counter() - t_recv)
+
+        def timed(*a, **k):
+            fn(*a, **k)
+            deliver_lat.append(time.perf_counter() - t_recv)
+            delivered["n"] += 1
+        return orig_submit(key, timed, *args, **kwargs)
+
+    websocket_handler.on_message = on_message
+    websocket_handler.submit_alert = submit
+    websocket_handler.send_to_telegram = _fake_send
+
+    sent0 = srv.stats()["ticks_sent"]
+    websocket_handler.start_websocket(watchlist)
+    time.sleep(duration)
+    sent = srv.stats()["ticks_sent"] - sent0
+    return {
+        "duration_sec": duration,
+        "symbols": len(watchlist),
+        "ticks_sent": sent,
+        "ticks_received": recv["ticks"],
+        "frames": recv["frames"],
+        "ticks_per_sec": round(recv["ticks"] / duration, 1),
+        "on_message_capacity_ticks_per_sec": round(recv["ticks"] / recv["busy"], 1) if recv["busy"] else None,
+        "alerts_enqueued": len(enqueue_lat),
+        "alerts_delivered": delivered["n"],
+        "tick_to_enqueue_ms": _percentiles(enqueue_lat),
+        "tick_to_delivery_ms": _percentiles(deliver_lat),
+        "alert_trace_sec": latency_summary(),
+    }
+
+def bench_metrics(srv: FakeFinnhub, watchlist: list, duration: float, poll_sec: int) -> dict:
+    import metrics_service
+    metrics_service.send_to_telegram = _fake_send
+    before = srv.stats()["calls"].get("/stock/candle", 0)
+    metrics_service.start_metrics(watchlist, poll_sec=poll_sec)
+    time.sleep(duration)
+    candle_calls = srv.stats()["calls"].get("/stock/candle", 0) - before
+    fresh = metrics_service.freshness()
+    ages = sorted(v["age_sec"] for v in fresh.values() if v["age_sec"] is not None)
+    return {
+        "duration_sec": duration,
+        "poll_sec": poll_sec,
+        "candle_calls": candle_calls,
+        "candle_calls_per_symbol_per_min": round(candle_calls / max(1, len(watchlist)) / (duration / 60.0), 2),
+        "symbols_fresh": len(ages),
+        "live_symbols": sum(1 for v in fresh.values() if v["source"] == "live"),
+        "age_sec_p50": ages[len(ages) // 2] if ages else None,
+        "age_sec_max": ages[-1] if ages else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmarks against the fake Finnhub server")
+    ap.add_argument("--universe", type=int, default=2000)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--rate-per-min", type=int, default=0, help="server-side quota; 0 = unlimited")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--calls-per-min", type=int, default=6000, help="client FINNHUB_CALLS_PER_MIN")
+    ap.add_argument("--ticks-per-sec", type=float, default=500.0)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds for the ticks/metrics phases")
+    ap.add_argument("--ws-shards", type=int, default=1, help="WebSocket connections (fake server streams ticks-per-sec per connection)")
+    ap.add_argument("--poll-sec", type=int, default=6)
+    ap.add_argument("--phases", default="scan,ticks,metrics")
+    ap.add_argument("--out", default=os.path.join(HERE, "results"))
+    args = ap.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+
+    srv = FakeFinnhub(universe=args.universe, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      rate_per_min=args.rate_per_min, error_rate=args.error_rate,
+                      ticks_per_sec=args.ticks_per_sec).start()
+    workdir = tempfile.mkdtemp(prefix="moneybot-bench-")
+    _configure_env(srv, workdir, args.calls_per_min, args.ws_shards)
+    phases = set(args.phases.split(","))
+
+    results = {}
+    watchlist = []
+    if "scan" in phases:
+        results["scan"], watchlist = bench_scan(srv, args.limit)
+        print("scan   :", json.dumps(results["scan"], ensure_ascii=False))
+    if not watchlist:
+        # בלי סריקה (או בלי תוצאות) – רשימת מעקב סינתטית מתוך היקום
+        watchlist = [{"symbol": s, "open": srv.market.base_price(s), "tier": "A" if i % 3 == 0 else "B", "rvol": 2.5}
+                     for i, s in enumerate(srv.market.symbols[:args.limit])]
+    if "ticks" in phases:
+        results["ticks"] = bench_ticks(srv, watchlist, args.duration)
+        print("ticks  :", json.dumps(results["ticks"], ensure_ascii=False))
+    if "metrics" in phases:
+        results["metrics"] = bench_metrics(srv, watchlist, args.duration, args.poll_sec)
+        print("metrics:", json.dumps(results["metrics"], ensure_ascii=False))
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "params": vars(args),
+        "server": srv.stats(),
+        "results": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("saved  :", path)
+    os._exit(0)   # threads של WS/metrics/fundamentals הם daemon – יציאה מיידית
+
+if __name__ == "__main__":
+    main()
@@ -11,3 +11,36 @@ APP_URL         = os.getenv("APP_URL")
 YT_API_KEY       = os.getenv("YT_API_KEY")            # חובה אם רוצים משיכת סרטונים
 YT_CHANNEL_IDS   = os.getenv("YT_CHANNEL_IDS", "")    # פסיק-מופרד: UCxxxx,UCyyyy
 YOUTUBE_LOOKBACK = int(os.getenv("YOUTUBE_LOOKBACK", "10"))  # כמה סרטונים אחרונים לכל ערוץ
+
+# כתובות Finnhub – ניתנות להחלפה (למשל לשרת הדמה ב-benchmarks/fake_finnhub.py)
+FINNHUB_REST_URL = os.getenv("FINNHUB_REST_URL", "https://finnhub.io/api/v1")
+FINNHUB_WS_URL   = os.getenv("FINNHUB_WS_URL", "wss://ws.finnhub.io")
+
+# קאש מקומי (SQLite) – יקום סמלים ונתונים שמשתנים לאט
+CACHE_DB_PATH    = os.getenv("CACHE_DB_PATH", "bot_cache.db")
+UNIVERSE_TTL_SEC = int(os.getenv("UNIVERSE_TTL_SEC", str(12 * 3600)))  # תוקף snapshot של יקום US
+
+# מכסת Finnhub (משותפת לכל הסורק/פולינג/חדשות)
+FINNHUB_CALLS_PER_MIN   = int(os.getenv("FINNHUB_CALLS_PER_MIN", "60"))
+FINNHUB_MAX_CONCURRENCY = int(os.getenv("FINNHUB_MAX_CONCURRENCY", "8"))
+
+# סריקה חוזרת ברקע (עדכון רשימת המעקב בלי redeploy)
+RESCAN_INTERVAL_SEC = int(os.getenv("RESCAN_INTERVAL_SEC", "900"))
+
+# תור התראות (מנותק מת'רד ה-WebSocket)
+ALERT_WORKERS   = int(os.getenv("ALERT_WORKERS", "4"))
+ALERT_QUEUE_MAX = int(os.getenv("ALERT_QUEUE_MAX", "100"))
+
+# מאגר מנויים (SQLite WAL) – משותף ל-webhook_server ולשולח
+SUBSCRIBERS_DB = os.getenv("SUBSCRIBERS_DB", "subscribers.db")
+
+# הקלטת פריימים גולמיים מה-WebSocket (לשחזור עם ws_replay); ריק = כבוי. סיומת .gz = דחוס
+WS_RECORD_PATH = os.getenv("WS_RECORD_PATH", "")
+
+# פוטר התראה עם השהיה מקצה-לקצה (מהטרייד בבורסה עד בניית ההודעה)
+ALERT_LATENCY_FOOTER = os.getenv("ALERT_LATENCY_FOOTER", "0").lower() in ("1", "true", "yes")
+
+# חיבורי WebSocket: מספר shards (בתוכנית החינמית של Finnhub מותר חיבור אחד לכל מפתח) ומנות subscribe
+WS_SHARDS            = int(os.getenv("WS_SHARDS", "1"))
+WS_SUBSCRIBE_BATCH   = int(os.getenv("WS_SUBSCRIBE_BATCH", "25"))    # burst של הודעות subscribe
+WS_SUBSCRIBE_PER_SEC = float(os.getenv("WS_SUBSCRIBE_PER_SEC", "50")) # קצב מתמשך, משותף לכל ה-shards
@@ -0,0 +1,139 @@
+# filter_planner.py
+# -*- coding: utf-8 -*-
+"""
+מתכנן סדר בדיקות לסורק: לכל קריטריון נמדדים שיעור מעבר וזמן (עלות),
+והבדיקות רצות לפי cost / (1 - pass_rate) עולה – זול וסלקטיבי קודם.
+זה הסדר שממזער את התוחלת של עלות בדיקה לכל סימול (בדיקות AND בלתי תלויות).
+הסטטיסטיקה נשמרת ב-SQLite בין ריצות.
+"""
+import time
+import sqlite3
+import logging
+import threading
+from config import CACHE_DB_PATH
+
+PRIOR_WEIGHT     = 5.0      # משקל ה-prior (בתצפיות מדומות) עד שנצברים נתונים
+MAX_HISTORY      = 5000.0   # מעבר לזה הסטטיסטיקה נחצית – כדי להתאים לשינויים
+REORDER_EVERY    = 50       # חישוב סדר מחדש כל N תצפיות
+
+class _Stat:
+    __slots__ = ("evals", "passes", "total_sec")
+
+    def __init__(self, evals=0.0, passes=0.0, total_sec=0.0):
+        self.evals = evals
+        self.passes = passes
+        self.total_sec = total_sec
+
+class FilterPlanner:
+    """
+    criteria: [(name, check, prior_pass_rate, prior_cost_sec)] – check(entry) -> bool
+    (מעשיר את entry בשדות שחישב). הסדר ברשימה הוא גם סדר ברירת המחדל.
+    """
+
+    def __init__(self, plan_name: str, criteria: list[tuple]):
+        self.plan_name = plan_name
+        self._checks = {name: check for name, check, _, _ in criteria}
+        self._prior = {name: (p, c) for name, _, p, c in criteria}
+        self._stats = {name: _Stat() for name in self._checks}
+        self._order = list(self._checks)
+        self._since_reorder = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ===== סטטיסטיקה =====
+    def _estimates(self, name: str) -> tuple[float, float]:
+        """(pass_rate, cost_sec) – ממוצע משוקלל של ה-prior והתצפיות."""
+        p0, c0 = self._prior[name]
+        st = self._stats[name]
+        n = PRIOR_WEIGHT + st.evals
+        pass_rate = (p0 * PRIOR_WEIGHT + st.passes) / n
+        cost = (c0 * PRIOR_WEIGHT + st.total_sec) / n
+        return pass_rate, cost
+
+    def _rank(self, name: str) -> float:
+        pass_rate, cost = self._estimates(name)
+        if pass_rate >= 1.0:
+            return float("inf")
+        return cost / (1.0 - pass_rate)
+
+    def order(self) -> list[str]:
+        self._ensure_loaded()
+        return self._order
+
+    def record(self, name: str, passed: bool, elapsed_sec: float):
+        with self._lock:
+            st = self._stats[name]
+            st.evals += 1
+            st.passes += 1 if passed else 0
+            st.total_sec += elapsed_sec
+            if st.evals > MAX_HISTORY:
+                st.evals /= 2; st.passes /= 2; st.total_sec /= 2
+            self._since_reorder += 1
+            if self._since_reorder >= REORDER_EVERY:
+                self._since_reorder = 0
+                self._reorder_locked()
+
+    def _reorder_locked(self):
+        new_order = sorted(self._checks, key=self._rank)
+        if new_order != self._order:
+            logging.info("filter plan %s: %s → %s", self.plan_name, self._order, new_order)
+            self._order = new_order
+
+    def run(self, entry: dict, before_each=None) -> bool:
+        """
+        מריץ את הבדיקות לפי הסדר הנוכחי; עוצר בכישלון הראשון.
+        before_each(name) -> True מאפשר לעצור לפני בדיקה (למשל pruning לפי ציון).
+        """
+        for name in self.order():
+            if before_each is not None and before_each(name):
+                return False
+            t0 = time.perf_counter()
+            ok = bool(self._checks[name](entry))
+            self.record(name, ok, time.perf_counter() - t0)
+            if not ok:
+                return False
+        return True
+
+    def summary(self) -> dict:
+        out = {}
+        for name in self.order():
+            p, c = self._estimates(name)
+            out[name] = {"pass_rate": round(p, 3), "cost_ms": round(c * 1000, 1)}
+        return out
+
+    # ===== התמדה =====
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=10)
+        conn.execute("CREATE TABLE IF NOT EXISTS filter_stats ("
+                     "plan TEXT NOT NULL, name TEXT NOT NULL, evals REAL, passes REAL, total_sec REAL, "
+                     "PRIMARY KEY (plan, name))")
+        return conn
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT name, evals, passes, total_sec FROM filter_stats WHERE plan=?",
+                                        (self.plan_name,)).fetchall()
+                for name, evals, passes, total_sec in rows:
+                    if name in self._stats:
+                        self._stats[name] = _Stat(evals, passes, total_sec)
+            except Exception as e:
+                logging.error("filter stats load failed (%s): %s", self.plan_name, e)
+            self._reorder_locked()
+            self._loaded = True
+
+    def save(self):
+        with self._lock:
+            rows = [(self.plan_name, n, st.evals, st.passes, st.total_sec) for n, st in self._stats.items()]
+        try:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO filter_stats(plan, name, evals, passes, total_sec) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+        except Exception as e:
+            logging.error("filter stats save failed (%s): %s", self.plan_name, e)
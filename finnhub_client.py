@@ -0,0 +1,118 @@
+# finnhub_client.py
+# -*- coding: utf-8 -*-
+import time
+import logging
+import requests
+from config import FINNHUB_API_KEY, FINNHUB_CALLS_PER_MIN, FINNHUB_MAX_CONCURRENCY, FINNHUB_REST_URL
+from request_cache import TTLCache, SingleFlight
+from rate_limiter import AdaptiveLimiter
+from telemetry import FINNHUB_REQUESTS, FINNHUB_SECONDS, FINNHUB_THROTTLED, Gauge
+
+FINNHUB_BASE_URL = FINNHUB_REST_URL.rstrip("/")
+REQUEST_TIMEOUT  = 12
+
+# ===== TTL לתשובות לפי endpoint (שניות; 0 = בלי קאש) =====
+ENDPOINT_TTL_SEC = {
+    "/quote":           5,
+    "/company-news":    60,
+    "/stock/profile2":  300,
+    "/stock/metric":    300,
+    "/stock/symbol":    0,     # מנוהל ע"י symbol_universe
+}
+CANDLE_TTL_SEC = {"1": 15, "5": 60, "D": 900}   # לפי resolution
+CACHE_MAX_ENTRIES = 4096
+
+# ===== הגבלת קצב =====
+QUOTA_HEADROOM   = 0.95    # נשארים מעט מתחת למכסה
+MAX_429_RETRIES  = 3
+
+_session = requests.Session()
+_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES)
+_flight = SingleFlight()
+_limiter = AdaptiveLimiter(
+    max_rate_per_sec=FINNHUB_CALLS_PER_MIN * QUOTA_HEADROOM / 60.0,
+    burst=max(1, FINNHUB_CALLS_PER_MIN // 6),
+    max_concurrency=FINNHUB_MAX_CONCURRENCY,
+)
+
+def _ttl_for(path: str, params: dict) -> float:
+    if path == "/stock/candle":
+        return CANDLE_TTL_SEC.get(str(params.get("resolution")), 15)
+    return ENDPOINT_TTL_SEC.get(path, 0)
+
+def get_json(path: str, params: dict | None = None, timeout=REQUEST_TIMEOUT):
+    """
+    GET ל-Finnhub (path יחסי, למשל "/quote"). מחזיר JSON או None בכשל.
+    תשובות נשמרות בקאש לפי ENDPOINT_TTL_SEC, ובקשות זהות במקביל מתאחדות לאחת.
+    הערה: התשובה משותפת בין הקוראים – לא לשנות אותה במקום.
+    """
+    params = params or {}
+    ttl = _ttl_for(path, params)
+    key = (path, tuple(sorted(params.items())))
+    if ttl > 0:
+        hit, value = _cache.get(key)
+        if hit:
+            return value
+
+    def _load():
+        data = _fetch(path, params, timeout)
+        if data is not None:
+            _cache.set(key, data, ttl)
+        return data
+
+    return _flight.do(key, _load)
+
+def cache_stats() -> dict:
+    """מוני hit/miss של שכבת הקאש – כמה קריאות רשת נחסכו."""
+    return {
+        "hits": _cache.hits,
+        "misses": _cache.misses,
+        "coalesced": _flight.coalesced,
+        "evictions": _cache.evictions,
+        "size": len(_cache),
+    }
+
+def limiter_stats() -> dict:
+    """מצב מגביל הקצב: קצב נוכחי, חלון מקביליות, בקשות פעילות ומספר 429."""
+    return _limiter.stats()
+
+def _retry_after(r) -> float | None:
+    try:
+        return max(0.0, float(r.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+def _fetch(path: str, params: dict, timeout):
+    q = dict(params)
+    q["token"] = FINNHUB_API_KEY
+    url = FINNHUB_BASE_URL + path
+    try:
+        for attempt in range(MAX_429_RETRIES + 1):
+            t0 = time.perf_counter()
+            try:
+                with _limiter.slot():
+                    r = _session.get(url, params=q, timeout=timeout)
+            except Exception:
+                FINNHUB_REQUESTS.inc(path, "error")
+                raise
+            finally:
+                FINNHUB_SECONDS.observe(path, value=time.perf_counter() - t0)
+            FINNHUB_REQUESTS.inc(path, str(r.status_code))
+            if r.status_code != 429:
+                if 200 <= r.status_code < 300:
+                    _limiter.on_success()     # רק 2xx מגדיל את חלון המקביליות – לא כש-Finnhub נכשל
+                break
+            _limiter.on_throttle(_retry_after(r))
+            FINNHUB_THROTTLED.inc(path)
+            logging.warning("429 from Finnhub on %s (attempt %d) – %s", path, attempt + 1, _limiter.stats())
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        # לא מדפיסים את ה-URL המלא – הוא כולל את הטוקן
+        logging.error("GET failed for %s %s: %s", path, params or {}, e)
+        return None
+
+Gauge("moneybot_finnhub_cache_total", "Finnhub response cache counters", ("event",), kind="counter",
+      fn=lambda: {(k,): v for k, v in cache_stats().items() if k != "size"})
+Gauge("moneybot_finnhub_limiter", "Finnhub adaptive limiter state", ("field",),
+      fn=lambda: {(k,): v for k, v in limiter_stats().items() if isinstance(v, (int, float))})
@@ -0,0 +1,191 @@
+# fundamentals_store.py
+# -*- coding: utf-8 -*-
+"""
+מאגר פונדמנטלים מקומי (SQLite) לפי סימול, עם TTL לכל שדה.
+Market Cap ו-Short Float משתנים לכל היותר פעם ביום – אין סיבה לשלם עליהם
+בקריאות profile2/metric בכל סריקה. ערך שפג תוקפו מוחזר מיד ומתרענן ברקע
+(stale-while-revalidate); רק סימול שלא נראה מעולם נשלף סינכרונית.
+"""
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from config import CACHE_DB_PATH
+from finnhub_client import get_json
+
+# ===== TTL לכל שדה (שניות) =====
+FIELD_TTL_SEC = {
+    "market_cap":  24 * 3600,
+    "short_float": 24 * 3600,
+}
+MISSING_TTL_SEC   = 6 * 3600        # "אין נתון" (למשל ETF בלי profile) – נבדק שוב מוקדם יותר
+MAX_STALE_SEC     = 7 * 24 * 3600   # מעבר לזה – לא מחזירים ערך ישן, שולפים סינכרונית
+FLUSH_EVERY_ROWS  = 200
+FLUSH_EVERY_SEC   = 5.0
+
+# ===== מקורות: איזה endpoint ממלא אילו שדות =====
+_FIELD_SOURCE = {"market_cap": "profile", "short_float": "metric"}
+
+def extract_short_float(metric_json: dict) -> float | None:
+    """מחלץ Short Float% (0–100) מתוך metric – מנסה כמה שמות-שדה נפוצים."""
+    if not metric_json:
+        return None
+    m = metric_json.get("metric") or {}
+    candidates = [
+        "shortPercentFloat", "ShortPercentFloat",
+        "shortRatio", "ShortRatio",
+        "ShortInterestFloat", "shortInterestFloat",
+        "shortInterestPercentFloat", "ShortPercentOfFloat"
+    ]
+    for k in candidates:
+        val = m.get(k)
+        if val is None:
+            continue
+        try:
+            val = float(val)
+            if val <= 1.0:  # לפעמים מגיע ביחס (0–1)
+                val *= 100.0
+            return val
+        except Exception:
+            continue
+    return None
+
+def _load_profile(symbol: str) -> dict | None:
+    profile = get_json("/stock/profile2", {"symbol": symbol})
+    if profile is None:
+        return None  # כשל רשת – לא שומרים
+    mcap = profile.get("marketCapitalization") or 0
+    return {"market_cap": float(mcap) if mcap > 0 else None}
+
+def _load_metric(symbol: str) -> dict | None:
+    metric = get_json("/stock/metric", {"symbol": symbol, "metric": "all"})
+    if metric is None:
+        return None
+    return {"short_float": extract_short_float(metric)}
+
+_LOADERS = {"profile": _load_profile, "metric": _load_metric}
+
+# ===== זיכרון + SQLite =====
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_mem: dict[tuple[str, str], tuple[float | None, float]] = {}   # {(symbol, field): (value, fetched_at)}
+_dirty: dict[tuple[str, str], tuple[float | None, float]] = {}
+_last_flush = 0.0
+
+_refresh_q: "queue.Queue[tuple[str, str]]" = queue.Queue()
+_refresh_pending: set[tuple[str, str]] = set()
+_refresh_thread: threading.Thread | None = None
+
+def _ensure_open():
+    """פתיחת ה-DB וטעינת כל הרשומות לזיכרון (פעם אחת). נקרא תחת _lock."""
+    global _conn, _last_flush
+    if _conn is not None:
+        return
+    _conn = sqlite3.connect(CACHE_DB_PATH, timeout=10, check_same_thread=False)
+    _conn.execute("PRAGMA journal_mode=WAL")
+    _conn.execute("PRAGMA synchronous=NORMAL")
+    _conn.execute("CREATE TABLE IF NOT EXISTS fundamentals ("
+                  "symbol TEXT NOT NULL, field TEXT NOT NULL, value REAL, fetched_at REAL NOT NULL, "
+                  "PRIMARY KEY (symbol, field))")
+    for sym, field, value, ts in _conn.execute("SELECT symbol, field, value, fetched_at FROM fundamentals"):
+        _mem[(sym, field)] = (value, ts)
+    _last_flush = time.time()
+    logging.info("fundamentals store loaded: %d rows", len(_mem))
+
+def _flush_locked():
+    global _last_flush
+    if _dirty and _conn is not None:
+        rows = [(s, f, v, ts) for (s, f), (v, ts) in _dirty.items()]
+        try:
+            with _conn:
+                _conn.executemany("INSERT OR REPLACE INTO fundamentals(symbol, field, value, fetched_at) "
+                                  "VALUES (?, ?, ?, ?)", rows)
+            _dirty.clear()
+        except Exception as e:
+            logging.error("fundamentals flush failed: %s", e)
+    _last_flush = time.time()
+
+def flush():
+    """כתיבת כל השינויים שבזיכרון ל-SQLite."""
+    with _lock:
+        _flush_locked()
+
+atexit.register(flush)
+
+def _put_many(symbol: str, values: dict, now: float):
+    with _lock:
+        _ensure_open()
+        for field, value in values.items():
+            _mem[(symbol, field)] = (value, now)
+            _dirty[(symbol, field)] = (value, now)
+        if len(_dirty) >= FLUSH_EVERY_ROWS or now - _last_flush >= FLUSH_EVERY_SEC:
+            _flush_locked()
+
+def _fetch_source(symbol: str, source: str) -> dict | None:
+    values = _LOADERS[source](symbol)
+    if values is not None:
+        _put_many(symbol, values, time.time())
+    return values
+
+# ===== רענון ברקע =====
+def _refresh_worker():
+    while True:
+        symbol, source = _refresh_q.get()
+        try:
+            _fetch_source(symbol, source)
+        except Exception as e:
+            logging.error("fundamentals refresh failed for %s/%s: %s", symbol, source, e)
+        finally:
+            with _lock:
+                _refresh_pending.discard((symbol, source))
+
+def _schedule_refresh(symbol: str, source: str):
+    global _refresh_thread
+    with _lock:
+        if (symbol, source) in _refresh_pending:
+            return
+        _refresh_pending.add((symbol, source))
+        if _refresh_thread is None:
+            _refresh_thread = threading.Thread(target=_refresh_worker, daemon=True)
+            _refresh_thread.start()
+    _refresh_q.put((symbol, source))
+
+# ===== API =====
+def _ttl(field: str, value) -> float:
+    return FIELD_TTL_SEC[field] if value is not None else MISSING_TTL_SEC
+
+def peek(symbol: str, field: str) -> tuple[bool, float | None]:
+    """(known, value) מתוך הזיכרון בלבד – בלי רשת ובלי תלות ב-TTL."""
+    with _lock:
+        _ensure_open()
+        rec = _mem.get((symbol, field))
+    return (rec is not None), (rec[0] if rec else None)
+
+def get(symbol: str, field: str) -> float | None:
+    """
+    ערך השדה לסימול. טרי → מהזיכרון; פג תוקף → הערך הישן + רענון ברקע;
+    לא ידוע (או ישן מדי) → שליפה סינכרונית. None = אין נתון.
+    """
+    source = _FIELD_SOURCE[field]
+    now = time.time()
+    with _lock:
+        _ensure_open()
+        rec = _mem.get((symbol, field))
+    if rec is not None:
+        value, ts = rec
+        age = now - ts
+        if age < _ttl(field, value):
+            return value
+        if age < MAX_STALE_SEC:
+            _schedule_refresh(symbol, source)
+            return value
+    values = _fetch_source(symbol, source)
+    return values.get(field) if values else None
+
+def get_market_cap(symbol: str) -> float | None:
+    return get(symbol, "market_cap")
+
+def get_short_float(symbol: str) -> float | None:
+    return get(symbol, "short_float")
@@ -0,0 +1,162 @@
+# indicators.py
+# -*- coding: utf-8 -*-
+"""
+מנוע אינדיקטורים וניקוד וקטורי (NumPy) לאצוות סימולים בבת אחת:
+ATR(14)%, Avg$Vol(10d), ממוצע נפח 10 ימים, RVOL, Gap% והציון המלא של stock_fetcher._score.
+
+התוצאות זהות ביט-לביט לפונקציות ב-stock_fetcher: הנרות נערמים למטריצה (time, batch)
+מיושרת לימין (הבר האחרון בשורה האחרונה), והסכומים מצטברים שורה אחר שורה משמאל לימין –
+אותו סדר פעולות כמו sum() של פייתון עד 3.11 (np.sum סוכם בזוגות ונותן תוצאה שונה בביט האחרון).
+מ-3.12 sum() של floats מפצה שגיאה, כך שהזהות מובטחת רק מול סכימה משמאל לימין –
+benchmarks/bench_indicators.py משווה כך בשני הצדדים. מודול אופציונלי: numpy ב-requirements-dev.txt.
+ערך חסר (None בפונקציות המקוריות) = NaN.
+"""
+import numpy as np
+
+from stock_fetcher import (
+    RVOL_TARGETS, GAP_TARGETS_PCT, ATR_TARGETS_PCT,
+    MIN_AVG_DOLLAR_VOL, GOOD_AVG_DOLLAR_VOL, MAX_SCORE,
+)
+
+ATR_PERIOD = 14
+ADV_DAYS   = 10
+
+# ===== עזרי מבנה =====
+def stack_right(series: list, width: int) -> np.ndarray:
+    """
+    width הערכים האחרונים של כל סדרה → מטריצה (width, batch) מיושרת לימין.
+    סדרה קצרה מ-width מרופדת ב-NaN בתחילתה; None = סדרה ריקה.
+    """
+    nan = float("nan")
+    pad = [nan] * width
+    rows = []
+    for s in series:
+        tail = s[-width:] if s else ()
+        rows.append(tail if len(tail) == width else pad[len(tail):] + list(tail))
+    if not rows:
+        return np.empty((width, 0))
+    return np.array(rows, dtype=float).T   # המרה אחת לכל האצווה
+
+def _seq_sum(rows: np.ndarray) -> np.ndarray:
+    """סכום לאורך ציר הזמן בסדר סדרתי (כמו sum() של פייתון עד 3.11) – וקטורי לרוחב האצווה."""
+    acc = np.zeros(rows.shape[1])
+    for row in rows:
+        acc = acc + row
+    return acc
+
+def stack_daily(daily: list, period: int = ATR_PERIOD, days: int = ADV_DAYS) -> dict:
+    """
+    נרות יומיים (dict של Finnhub או None לכל סימול) → מערכים מוערמים (time, batch), פעם אחת לאצווה.
+    h/l/c_atr – period+1 הנרות האחרונים מתוך n=min(len(o,h,l,c)) הראשונים (כמו _atr_percent);
+    c/v – days האחרונים של כל סדרה (כמו _avg_dollar_volume_10d ו-RVOL).
+    """
+    width = period + 1
+    hs, ls, cs_atr, last_c, cs, vs = [], [], [], [], [], []
+    for d in daily:
+        o, h, l, c = (d.get("o", []), d.get("h", []), d.get("l", []), d.get("c", [])) if d else ((), (), (), ())
+        n = min(len(o), len(h), len(l), len(c))
+        if n >= width:
+            hs.append(h[n - width:n]); ls.append(l[n - width:n]); cs_atr.append(c[n - width:n])
+            last_c.append(c[-1] or np.nan)
+        else:
+            hs.append(None); ls.append(None); cs_atr.append(None); last_c.append(np.nan)
+        c = (d.get("c") or []) if d else []
+        v = (d.get("v") or []) if d else []
+        cs.append(c if len(c) >= days else None)
+        vs.append(v if len(v) >= days else None)
+    return {
+        "h": stack_right(hs, width), "l": stack_right(ls, width), "c_atr": stack_right(cs_atr, width),
+        "last_c": np.asarray(last_c, dtype=float),
+        "c": stack_right(cs, days), "v": stack_right(vs, days),
+    }
+
+# ===== אינדיקטורים (על מערכים מוערמים) =====
+def atr_percent(stack: dict, period: int = ATR_PERIOD) -> np.ndarray:
+    """ATR(period) כאחוז מהסגירה האחרונה – זהה ל-stock_fetcher._atr_percent."""
+    H, L, C = stack["h"], stack["l"], stack["c_atr"]
+    prev_c = C[:-1]
+    high, low = H[1:], L[1:]
+    tr = np.maximum(np.maximum(high - low, np.abs(high - prev_c)), np.abs(low - prev_c))
+    atr = _seq_sum(tr[-period:]) / float(period)
+    last_c = stack["last_c"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = (atr / last_c) * 100.0
+    out[~(last_c > 0)] = np.nan
+    return out
+
+def avg_dollar_volume(stack: dict) -> np.ndarray:
+    """ממוצע Dollar-Volume – זהה ל-stock_fetcher._avg_dollar_volume_10d (NaN כשחסרים ימים)."""
+    C, V = stack["c"], stack["v"]
+    return _seq_sum(C * V) / C.shape[0]
+
+def avg_volume(stack: dict) -> np.ndarray:
+    """ממוצע נפח יומי (ביחידות מניה) – הבסיס ל-RVOL בשלב 2."""
+    V = stack["v"]
+    return _seq_sum(V) / float(V.shape[0])
+
+def rvol(intraday_volume, avg_vol) -> np.ndarray:
+    """נפח אינטרדיי מול ממוצע 10 ימים; ממוצע חסר/לא חיובי → NaN."""
+    iv = np.asarray(intraday_volume, dtype=float)
+    av = np.asarray(avg_vol, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = iv / av
+    out[~(av > 0)] = np.nan
+    return out
+
+def gap_pct(price, prev_close) -> np.ndarray:
+    """Gap% מול סגירה קודמת (כמו ב-_check_price_band); prev_close לא חיובי → NaN."""
+    c = np.asarray(price, dtype=float)
+    pc = np.asarray(prev_close, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = ((c - pc) / pc) * 100.0
+    out[~(pc > 0)] = np.nan
+    return out
+
+# ===== ניקוד =====
+def _column(entries: list, key: str) -> np.ndarray:
+    return np.array([np.nan if (x := e.get(key)) is None else x for e in entries], dtype=float)
+
+def score_batch(short_float, rvol, gap_pct, atr_pct, avg_dollar_vol_10d, momentum_from_open_pct) -> np.ndarray:
+    """
+    הציון 0–100 של stock_fetcher._score לאצווה (מערכים באותו אורך, NaN = חסר).
+    השוואות מול NaN תמיד False – בדיוק כמו הדילוג על None במקור.
+    """
+    sf = np.nan_to_num(np.asarray(short_float, dtype=float), nan=0.0)
+    rv = np.asarray(rvol, dtype=float)
+    gap = np.asarray(gap_pct, dtype=float)
+    atrp = np.asarray(atr_pct, dtype=float)
+    adv = np.nan_to_num(np.asarray(avg_dollar_vol_10d, dtype=float), nan=0.0)
+    mom = np.asarray(momentum_from_open_pct, dtype=float)
+
+    score = np.zeros(sf.shape, dtype=np.int64)
+    score += 20 * (sf >= 10) + 8 * (sf >= 20)
+    score += 20 * (rv >= RVOL_TARGETS[0]) + 10 * (rv >= RVOL_TARGETS[1])
+    gap_ok = (gap >= GAP_TARGETS_PCT[0]) & (gap <= GAP_TARGETS_PCT[1])
+    score += 20 * gap_ok + 10 * (gap_ok & (gap >= 5.0) & (gap <= 20.0))
+    score += 15 * ((atrp >= ATR_TARGETS_PCT[0]) & (atrp <= ATR_TARGETS_PCT[1]))
+    score += 10 * (adv >= MIN_AVG_DOLLAR_VOL) + 5 * (adv >= GOOD_AVG_DOLLAR_VOL)
+    score += 10 * (mom >= 3.0)
+    return np.minimum(score, MAX_SCORE)
+
+def score_entries(entries: list) -> np.ndarray:
+    """_score לרשימת entries (dicts של הסורק) בבת אחת."""
+    return score_batch(*(_column(entries, k) for k in (
+        "short_float", "rvol", "gap_pct", "atr_pct", "avg_dollar_vol_10d", "momentum_from_open_pct")))
+
+def compute_stage2_batch(entries: list, daily: list) -> list:
+    """
+    החישוב של _stage2_deep_filters (אחרי הבדיקות הקשיחות) לאצווה: entries עם intraday_volume
+    ונרות יומיים תואמים (daily[i] של entries[i]). מעשיר כל entry ב-avg_dollar_vol_10d, atr_pct,
+    rvol ו-score – אותם ערכים בדיוק כמו החישוב לסימול בודד.
+    """
+    stack = stack_daily(daily)
+    adv = avg_dollar_volume(stack)
+    atr = atr_percent(stack)
+    rv = rvol([e["intraday_volume"] for e in entries], avg_volume(stack))
+    for e, a, t, r in zip(entries, adv.tolist(), atr.tolist(), rv.tolist()):
+        e["avg_dollar_vol_10d"] = None if a != a or a == 0 else a   # NaN/0 → None, כמו במקור
+        e["atr_pct"] = None if t != t else t
+        e["rvol"] = None if r != r else r
+    for e, sc in zip(entries, score_entries(entries).tolist()):
+        e["score"] = sc
+    return entries
@@ -1,5 +1,6 @@
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
+import telemetry
 
 app = Flask(__name__)
 
@@ -7,6 +8,11 @@ app = Flask(__name__)
 def home():
     return "✅ Bot is alive and listening on port 8080!"
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape (text format 0.0.4)."""
+    return Response(telemetry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 def run():
     app.run(host='0.0.0.0', port=8080)
 
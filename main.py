@@ -3,10 +3,12 @@ from dotenv import load_dotenv
 from config import FINNHUB_API_KEY, APP_URL
 from keep_alive import keep_alive
 from stock_fetcher import get_microcap_symbols
-from websocket_handler import start_websocket
+from websocket_handler import start_websocket, current_symbols
 from metrics_service import start_metrics
+from rescan_scheduler import start_rescan
 from telegram_service import send_to_telegram
 from youtube_watchlist import fetch_watchlist_from_youtube
+from news_service import start_news_prefetch
 import logger, logging, os
 
 load_dotenv()
@@ -38,7 +40,9 @@ def run_bot():
 
         # RT: WebSocket טיקים + Metrics פולינג לנרות 1ד׳
         start_websocket(symbols_info)
+        start_news_prefetch(current_symbols)
         start_metrics(symbols_info, poll_sec=30)
+        start_rescan(limit=50, priority_symbols=wl)
 
         send_to_telegram("🔔 התראות מופעלות: VWAP / VolumeSpike / HOD / Heads-up ל-Tier B + חדשות עם סנטימנט.")
 
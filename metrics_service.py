@@ -1,26 +1,33 @@
 # metrics_service.py
-import time, logging
-from datetime import datetime, timezone, timedelta
-import requests
+import time, logging, threading
+from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from session_time import session_start_end, get_session_label
 from telegram_service import send_to_telegram
 from news_service import get_today_news
+from alert_dispatcher import submit_alert
 from math import isfinite
-from config import FINNHUB_API_KEY
+from finnhub_client import get_json
+from bar_aggregator import aggregator, BAR_SEC
+from telemetry import Gauge
+from alert_trace import AlertTrace
+from config import ALERT_LATENCY_FOOTER
 
 REQUEST_TIMEOUT = 10
+LIVE_FRESH_SEC  = 90     # סימול עם נר חי עדכני מדלג על פולינג REST (REST רק ל-backfill/השלמה)
+LIVE_EVAL_SEC   = 1.0    # מרווח מינימלי בין הערכות חוקים על הנר שנבנה (נר שנסגר – מיד)
+
+# ===== מתזמן פולינג =====
+METRICS_WORKERS   = 8      # בקשות REST במקביל (מעליהן ה-rate limiter של finnhub_client)
+DEADLINE_FRACTION = 0.8    # כל סבב חייב להסתיים תוך 80% מאורכו – מה שלא הספיק עובר לראש הסבב הבא
+HOT_RVOL_1M       = 2.0    # נפח הנר האחרון ≥ פי 2 מהממוצע → סימול "חם"
+HOT_MOVE_PCT      = 0.5    # או תזוזה ≥ 0.5% מאז הפולינג הקודם
 
 def _get_candles(symbol: str, resolution: str, ts_from: int, ts_to: int):
-    url = (f"https://finnhub.io/api/v1/stock/candle?symbol={symbol}"
-           f"&resolution={resolution}&from={ts_from}&to={ts_to}&token={FINNHUB_API_KEY}")
-    try:
-        r = requests.get(url, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        j = r.json()
-        return j if j.get("s") == "ok" else None
-    except Exception as e:
-        logging.error("candles fetch failed %s: %s", symbol, e)
-        return None
+    j = get_json("/stock/candle", {"symbol": symbol, "resolution": resolution, "from": ts_from, "to": ts_to},
+                 timeout=REQUEST_TIMEOUT)
+    return j if j and j.get("s") == "ok" else None
 
 def _fmt_money(x: float) -> str:
     try:
@@ -31,87 +38,381 @@ def _fmt_money(x: float) -> str:
     except Exception:
         return "—"
 
-def _vwap_from_candles(c: list[float], v: list[float]) -> float | None:
-    try:
-        num = sum(ci*vi for ci,vi in zip(c, v))
-        den = sum(v)
-        return num/den if den > 0 else None
-    except Exception:
-        return None
+def _send(info: dict, title_tag, body_lines: list[str], kind: str, price: float,
+          exchange_ts: float | None = None, recv_ts: float | None = None):
+    """
+    מכניס לתור ההתראות – החדשות והשליחה לא עוצרות את לולאת הפולינג. kind = סוג ההתראה לניתוב.
+    exchange_ts/recv_ts – תחילת ה-trace: בזרם החי הטרייד שהפעיל את החוק (בבורסה / קבלה מה-socket);
+    בפולינג REST סוף הנר האחרון / קבלת תשובת ה-candles.
+    """
+    symbol = info["symbol"]
+    submit_alert((symbol, kind), _deliver, symbol, title_tag, body_lines, datetime.now(),
+                 kind, info.get("tier"), price, trace=AlertTrace(kind, symbol, exchange_ts, recv_ts))
 
-def _send(symbol, title_tag, body_lines: list[str]):
-    now = datetime.now().strftime("%H:%M:%S")
+def _deliver(symbol, title_tag, body_lines: list[str], created_at: datetime,
+             alert_type: str, tier: str | None, price: float, trace: AlertTrace | None = None):
+    now = created_at.strftime("%H:%M:%S")
+    if trace is not None:
+        trace.mark_news_start()
     news = get_today_news(symbol)
+    footer = f"🔗 <a href='https://www.tradingview.com/symbols/{symbol}/'>גרף חי</a>  •  ⏱️ {now}"
+    if trace is not None:
+        trace.mark_news()
+        if ALERT_LATENCY_FOOTER:
+            footer += f"  •  ⚡ {trace.lag_sec():.2f}s"
     msg = (
         f"<b>📡 {title_tag}</b>\n"
         f"━━━━━━━━━━━━━━━━\n"
         f"📈 <b>{symbol}</b>\n"
         + "\n".join(body_lines) + "\n\n"
         f"{news}\n"
-        f"🔗 <a href='https://www.tradingview.com/symbols/{symbol}/'>גרף חי</a>  •  ⏱️ {now}"
+        f"{footer}"
     )
-    send_to_telegram(msg)
+    if trace is not None:
+        trace.mark_render()
+    send_to_telegram(msg, alert_type=alert_type, symbol=symbol, tier=tier, price=price, trace=trace)
+
+# ===== מצב אינקרמנטלי לסימול =====
+class _BarState:
+    """
+    צבירה אינקרמנטלית של נרות 1ד' מתחילת הסשן: VWAP (מונה/מכנה), HOD ונפחים אחרונים.
+    הנר האחרון (tail) עדיין נבנה – הוא מוחלף בכל פולינג, ורק כשמגיע נר חדש אחריו
+    הוא "ננעל" לתוך הסכומים.
+    """
+    __slots__ = ("session_from", "n_committed", "num", "den", "hod", "closes", "vols", "tail",
+                 "prev_above_vwap", "last_hod", "spike_bar", "live_at", "eval_at")
+
+    def __init__(self, session_from: int):
+        self.session_from = session_from
+        self.n_committed = 0
+        self.num = 0.0                     # Σ close·volume (נרות נעולים) – אותה נוסחה ל-REST ולזרם החי
+        self.den = 0.0                     # Σ volume
+        self.hod = float("-inf")
+        self.closes = deque(maxlen=5)      # 5 סגירות נעולות אחרונות (ל-Δ5m)
+        self.vols = deque(maxlen=20)       # 20 נפחים נעולים אחרונים (ממוצע 1ד')
+        self.tail: tuple[int, float, float, float, float] | None = None   # (t, close, volume, high, close·volume)
+        # מצב הטריגרים
+        self.prev_above_vwap = None
+        self.last_hod = None
+        self.spike_bar = None              # הנר שכבר קיבל Volume Spike
+        self.live_at = 0.0                 # monotonic של העדכון החי האחרון (0 = אין זרם חי)
+        self.eval_at = 0.0
+
+    def _commit(self, bar):
+        _, c, v, h, pv = bar
+        self.n_committed += 1
+        self.num += pv
+        self.den += v
+        self.hod = max(self.hod, h)
+        self.closes.append(c)
+        self.vols.append(v)
+
+    def apply(self, t: list, c: list, v: list, h: list) -> bool:
+        """
+        מחיל נרות שהתקבלו מ-tail.t והלאה. False = פער (הנר האחרון שהכרנו לא חזר
+        או סדר לא עולה) – צריך resync מלא מתחילת הסשן.
+        """
+        n = min(len(t), len(c), len(v), len(h))
+        if n == 0:
+            return True
+        start = 0
+        if self.tail is not None:
+            if t[0] != self.tail[0]:
+                return False
+            start = 1
+            self.tail = _make_bar(t[0], c[0], v[0], h[0])   # הנר שנבנה – גרסה עדכנית
+        prev_t = self.tail[0] if self.tail else None
+        for i in range(start, n):
+            if prev_t is not None and t[i] <= prev_t:
+                return False
+            if self.tail is not None:
+                self._commit(self.tail)
+            self.tail = _make_bar(t[i], c[i], v[i], h[i])
+            prev_t = t[i]
+        return True
+
+    def push_bar(self, t: int, c: float, v: float, h: float):
+        """
+        נר מהזרם החי. אותה דקה כמו ה-tail – מחליף אותו (אם לא "קטן" מגרסת ה-REST שכבר
+        ראינו, למשל כשהזרם התחבר באמצע הדקה); דקה חדשה – נועל את ה-tail. נר ישן נזרק.
+        ה-VWAP נצבר כ-close·volume גם לנר חי (לא Σprice·volume של הטריידים), כדי שהתוצאה
+        לא תלויה במקור שסיפק כל דקה.
+        """
+        if self.tail is not None:
+            if t < self.tail[0] or (t == self.tail[0] and v < self.tail[2]):
+                return
+            if t > self.tail[0]:
+                self._commit(self.tail)
+        self.tail = _make_bar(t, c, v, h)
+
+    # ===== נגזרות (כולל ה-tail) =====
+    def bar_count(self) -> int:
+        return self.n_committed + (1 if self.tail else 0)
+
+    def vwap(self) -> float | None:
+        _, _, v, _, pv = self.tail
+        den = self.den + v
+        return (self.num + pv) / den if den > 0 else None
+
+    def day_high(self) -> float:
+        return max(self.hod, self.tail[3])
+
+    def avg_volume(self) -> float:
+        """ממוצע נפח 1ד' של 20 הנרות שלפני האחרון (או של כל הנרות בתחילת הסשן)."""
+        if self.bar_count() > 21:
+            return sum(self.vols) / len(self.vols)
+        return (self.den + self.tail[2]) / self.bar_count()
+
+    def close_5m_ago(self) -> float | None:
+        return self.closes[0] if len(self.closes) == 5 else None
+
+def _make_bar(t, c, v, h) -> tuple:
+    c, v = float(c), float(v)
+    return (t, c, v, float(h), c * v)
+
+class _PollSlot:
+    """קצב הפולינג והטריות של סימול – נשמר גם כשה-_BarState נבנה מחדש ב-resync."""
+    __slots__ = ("cadence", "next_due", "updated_at", "last_px", "inflight")
+
+    def __init__(self, cadence: float):
+        self.cadence = cadence
+        self.next_due = 0.0        # monotonic; 0 = מיד
+        self.updated_at = 0.0      # wall-clock של העדכון האחרון (REST או חי)
+        self.last_px = None
+        self.inflight = False
+
+    def adapt(self, st: "_BarState", min_sec: float, max_sec: float):
+        """סימול חם – הקצב מוכפל (חצי מרווח); שקט – המרווח גדל בהדרגה עד התקרה."""
+        _, last, vol_last, _, _ = st.tail
+        avg1 = st.avg_volume()
+        moved = self.last_px and abs(last - self.last_px) / self.last_px * 100.0 >= HOT_MOVE_PCT
+        hot = (avg1 and vol_last >= HOT_RVOL_1M * avg1) or moved
+        self.cadence = max(min_sec, self.cadence / 2) if hot else min(max_sec, self.cadence * 1.25)
+        self.last_px = last
+
+_state: dict[str, _BarState] = {}     # per-symbol bar state
+_slots: dict[str, _PollSlot] = {}     # per-symbol polling schedule
+_infos: dict[str, dict] = {}
+_state_lock = threading.Lock()        # משותף ללולאת הפולינג ולת'רד ה-WebSocket
+
+def _poll_symbol(info: dict, session_from: int, now_ts: int, session: str) -> bool:
+    """
+    פולינג אינקרמנטלי לסימול אחד: רק נרות מהנר האחרון והלאה, resync מלא רק על פער.
+    הרשת מחוץ למנעול – ת'רד ה-WebSocket לא מחכה ל-REST. מחזיר True אם המצב עודכן.
+    """
+    sym = info["symbol"]
+    with _state_lock:
+        st = _state.get(sym)
+        if st is None or st.session_from != session_from:
+            prev = st
+            st = _state[sym] = _BarState(session_from)
+            if prev is not None:
+                # מעבר סשן (למשל pre → regular): הטריגרים ממשיכים כמו קודם – ה-HOD וצד ה-VWAP נשמרים
+                st.prev_above_vwap, st.last_hod = prev.prev_above_vwap, prev.last_hod
+        ts_from = st.tail[0] if st.tail else session_from
+
+    j = _get_candles(sym, "1", ts_from, now_ts)
+    if not j:
+        return False
+    with _state_lock:
+        ok = st.apply(j.get("t", []), j.get("c", []), j.get("v", []), j.get("h", []))
+    if not ok:
+        logging.warning("metrics gap for %s – full resync", sym)
+        j = _get_candles(sym, "1", session_from, now_ts)
+        fresh = _BarState(session_from)
+        if not j or not fresh.apply(j.get("t", []), j.get("c", []), j.get("v", []), j.get("h", [])):
+            return False
+        with _state_lock:
+            fresh.prev_above_vwap, fresh.last_hod = st.prev_above_vwap, st.last_hod
+            st = _state[sym] = fresh
+    recv_ts = time.time()
+    with _state_lock:
+        if st.bar_count() >= 3:
+            # מקור ה-trace: סוף הנר האחרון (הטרייד האחרון בו לא מאוחר מזה) – כך שנר
+            # בן כמה דקות נמדד כעיכוב feed ולא כ-0
+            _evaluate_rules(info, st, session, exchange_ts=min(st.tail[0] + BAR_SEC, recv_ts), recv_ts=recv_ts)
+    return st.tail is not None
+
+def _evaluate_rules(info: dict, st: _BarState, session: str,
+                    exchange_ts: float | None = None, recv_ts: float | None = None):
+    """VWAP Reclaim / Volume Spike / HOD Breakout על המצב המצטבר של הסימול."""
+    bar_t, last, vol_last, _, _ = st.tail
+    vwap = st.vwap()
+    avg1 = st.avg_volume()
+    hod = st.day_high()
+    if st.last_hod is None:
+        st.last_hod = hod
+
+    was_above = st.prev_above_vwap
+    is_above  = (vwap is not None and last > vwap)
+    # VWAP Reclaim
+    if vwap and was_above is False and is_above:
+        body = [
+            f"🟩 <b>VWAP Reclaim</b> ({session})",
+            f"💰 Price: <b>${last:.2f}</b>  |  VWAP: ${vwap:.2f}",
+            f"📦 1m Vol: {_fmt_money(vol_last)} (avg: {_fmt_money(avg1)})",
+        ]
+        _send(info, "Heads-up", body, kind="VWAP", price=last, exchange_ts=exchange_ts, recv_ts=recv_ts)
+    st.prev_above_vwap = is_above if vwap is not None else was_above
+    # Volume Spike
+    if avg1 and vol_last >= 3.0 * avg1 and st.spike_bar != bar_t:   # פעם אחת לנר
+        st.spike_bar = bar_t
+        c5 = st.close_5m_ago()
+        change_5m = ((last - c5) / c5 * 100.0) if c5 else 0.0
+        body = [
+            f"📈 <b>Volume Spike</b> ×{vol_last/max(1,avg1):.2f} ({session})",
+            f"💰 Price: <b>${last:.2f}</b>  |  Δ5m: {change_5m:.2f}%",
+        ]
+        _send(info, "Heads-up", body, kind="VOLUME", price=last, exchange_ts=exchange_ts, recv_ts=recv_ts)
+    # HOD Breakout
+    prev_hod = st.last_hod
+    if isfinite(last) and last > prev_hod * 1.001:  # buffer 0.1%
+        body = [
+            f"🚀 <b>HOD Breakout</b> ({session})",
+            f"💰 Price: <b>${last:.2f}</b>  |  HOD: ${prev_hod:.2f}",
+        ]
+        _send(info, "Heads-up", body, kind="HOD", price=last, exchange_ts=exchange_ts, recv_ts=recv_ts)
+        st.last_hod = last
+    else:
+        st.last_hod = max(prev_hod, hod)
+
+def freshness() -> dict:
+    """
+    טריות לכל סימול: {symbol: {"age_sec", "cadence_sec", "source"}}.
+    age_sec=None – עדיין לא התקבל אף נר. source: "live" (זרם טריידים) / "rest".
+    """
+    now, mono = time.time(), time.monotonic()
+    out = {}
+    with _state_lock:
+        for sym, slot in _slots.items():
+            st = _state.get(sym)
+            live = bool(st and st.live_at and mono - st.live_at < LIVE_FRESH_SEC)
+            out[sym] = {
+                "age_sec": round(now - slot.updated_at, 1) if slot.updated_at else None,
+                "cadence_sec": round(slot.cadence, 1),
+                "source": "live" if live else "rest",
+            }
+    return out
+
+Gauge("moneybot_metrics_age_seconds", "Seconds since the symbol's last bar update (REST or live)", ("symbol", "source"),
+      fn=lambda: {(sym, v["source"]): v["age_sec"] for sym, v in freshness().items()})
+Gauge("moneybot_metrics_cadence_seconds", "Current REST polling cadence per symbol", ("symbol",),
+      fn=lambda: {(sym,): v["cadence_sec"] for sym, v in freshness().items()})
+
+def _log_freshness():
+    f = freshness()
+    ages = sorted(v["age_sec"] for v in f.values() if v["age_sec"] is not None)
+    if not ages:
+        return
+    stale = [s for s, v in f.items() if v["age_sec"] is None or v["age_sec"] > 2 * v["cadence_sec"]]
+    logging.info("metrics freshness: %d symbols, live=%d, age p50=%.0fs max=%.0fs, stale=%s",
+                 len(f), sum(1 for v in f.values() if v["source"] == "live"),
+                 ages[len(ages) // 2], ages[-1], stale[:10])
 
 def start_metrics(symbols_info: list[dict], poll_sec: int = 30):
     """
     מריץ לולאה רקע לכל הסימולים: 1m candles מאז תחילת הסשן → VWAP/HOD/Volume Spike
-    שולח התראות כאשר יש טריגר.
+    שולח התראות כאשר יש טריגר. המקור העיקרי הוא נרות חיים מ-bar_aggregator (טריידים של
+    ה-WebSocket, בלי השהיית פולינג); REST משמש ל-backfill ראשוני ולסימולים בלי טריידים חיים,
+    ותמיד אינקרמנטלי – רק נרות מהנר האחרון שנראה.
+    פולינג ה-REST מתוזמן: poll_sec הוא הקצב ההתחלתי לסימול, סימולים חמים יורדים עד poll_sec/3
+    ושקטים עולים עד poll_sec*4. כל סבב (poll_sec/3) מריץ את הסימולים שהגיע תורם – הכי מאחרים
+    קודם – במקביל עד METRICS_WORKERS, עם דדליין קבוע.
+    symbols_info היא רשימה חיה – סריקה חוזרת מעדכנת אותה במקום, והלולאה קוראת אותה מחדש בכל סבב.
     """
-    state = {}  # per-symbol state
+    min_cadence, max_cadence = poll_sec / 3, poll_sec * 4
+    tick = min_cadence
+    pool = ThreadPoolExecutor(max_workers=METRICS_WORKERS, thread_name_prefix="metrics")
+
+    def on_live_bar(symbol: str, bar, closed: bool, trade_ts: float, recv_ts: float | None):
+        info = _infos.get(symbol)
+        if info is None:
+            return
+        with _state_lock:
+            st = _state.get(symbol)
+            if st is None or st.tail is None:
+                return                # עדיין אין backfill – ה-REST יביא את הסשן עד עכשיו
+            st.push_bar(bar.t, bar.c, bar.v, bar.h)
+            now = time.monotonic()
+            st.live_at = now
+            slot = _slots.get(symbol)
+            if slot is not None:
+                slot.updated_at = time.time()
+            if not closed and now - st.eval_at < LIVE_EVAL_SEC:
+                return
+            st.eval_at = 0.0 if closed else now   # אחרי נר שנסגר – גם הנר החדש מוערך מיד
+            if st.bar_count() >= 3:
+                _evaluate_rules(info, st, get_session_label(), exchange_ts=trade_ts, recv_ts=recv_ts)
+
+    aggregator.add_listener(on_live_bar)
+
+    def run_one(info, slot: _PollSlot, f_ts: int, t_ts: int, session: str):
+        try:
+            if _poll_symbol(info, f_ts, t_ts, session):
+                with _state_lock:
+                    slot.updated_at = time.time()
+                    st = _state.get(info["symbol"])
+                    if st is not None and st.tail is not None:
+                        slot.adapt(st, min_cadence, max_cadence)
+        except Exception as e:
+            logging.error("metrics poll error for %s: %s", info.get("symbol"), e)
+        finally:
+            slot.next_due = time.monotonic() + slot.cadence
+            slot.inflight = False
+
     def loop():
+        cycles = 0
         while True:
+            started = time.monotonic()
             try:
                 session_from, session_to = session_start_end()
                 f_ts = int(session_from.timestamp()); t_ts = int(datetime.now(timezone.utc).timestamp())
                 session = get_session_label()
-                for info in symbols_info:
+                watched = list(symbols_info)
+                live = {i["symbol"]: i for i in watched}
+                _infos.update(live)
+                with _state_lock:
+                    for sym in set(_state) - set(live):
+                        _state.pop(sym, None)   # סימול שיצא מהרשימה
+                    for sym in set(_slots) - set(live):
+                        _slots.pop(sym, None)
+                for sym in set(_infos) - set(live):
+                    _infos.pop(sym, None)
+
+                due = []
+                for info in watched:
                     sym = info["symbol"]
-                    j = _get_candles(sym, "1", f_ts, t_ts)
-                    if not j: continue
-                    c, v, h = j.get("c",[]), j.get("v",[]), j.get("h",[])
-                    if len(c) < 3: continue
-                    last = c[-1]; prev = c[-2]
-                    vol_last = v[-1]
-                    # VWAP
-                    vwap = _vwap_from_candles(c, v)
-                    # avg 1m volume (20)
-                    avg1 = sum(v[-21:-1]) / max(1, len(v[-21:-1])) if len(v) > 21 else (sum(v)/len(v) if v else 0)
-                    # HOD
-                    hod = max(h) if h else last
-                    # שמירה והסקת טריגרים
-                    st = state.setdefault(sym, {"prev_above_vwap": None, "last_hod": hod})
-                    was_above = st["prev_above_vwap"]
-                    is_above  = (vwap is not None and last > vwap)
-                    # VWAP Reclaim
-                    if vwap and was_above is False and is_above:
-                        body = [
-                            f"🟩 <b>VWAP Reclaim</b> ({session})",
-                            f"💰 Price: <b>${last:.2f}</b>  |  VWAP: ${vwap:.2f}",
-                            f"📦 1m Vol: {_fmt_money(vol_last)} (avg: {_fmt_money(avg1)})",
-                        ]
-                        _send(sym, "Heads-up", body)
-                    st["prev_above_vwap"] = is_above if vwap is not None else was_above
-                    # Volume Spike
-                    if avg1 and vol_last >= 3.0 * avg1:
-                        change_5m = ((last - c[-6]) / c[-6] * 100.0) if len(c) >= 6 and c[-6] else 0.0
-                        body = [
-                            f"📈 <b>Volume Spike</b> ×{vol_last/max(1,avg1):.2f} ({session})",
-                            f"💰 Price: <b>${last:.2f}</b>  |  Δ5m: {change_5m:.2f}%",
-                        ]
-                        _send(sym, "Heads-up", body)
-                    # HOD Breakout
-                    prev_hod = st.get("last_hod", hod)
-                    if isfinite(last) and last > prev_hod * 1.001:  # buffer 0.1%
-                        body = [
-                            f"🚀 <b>HOD Breakout</b> ({session})",
-                            f"💰 Price: <b>${last:.2f}</b>  |  HOD: ${prev_hod:.2f}",
-                        ]
-                        _send(sym, "Heads-up", body)
-                        st["last_hod"] = last
-                    else:
-                        st["last_hod"] = max(prev_hod, hod)
+                    slot = _slots.get(sym)
+                    if slot is None:
+                        slot = _slots[sym] = _PollSlot(poll_sec)
+                    if slot.inflight or slot.next_due > started:
+                        continue
+                    st = _state.get(sym)
+                    if st and st.session_from == f_ts and st.live_at and started - st.live_at < LIVE_FRESH_SEC:
+                        slot.next_due = started + slot.cadence   # הזרם החי מעדכן – אין צורך ב-REST
+                        continue
+                    due.append((slot.next_due, sym, info, slot))
+                due.sort(key=lambda d: d[0])                     # הכי מאחרים קודם
+
+                futures = {}
+                for _, sym, info, slot in due:
+                    slot.inflight = True
+                    futures[pool.submit(run_one, info, slot, f_ts, t_ts, session)] = slot
+                if futures:
+                    deadline = started + tick * DEADLINE_FRACTION
+                    _, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+                    late = 0
+                    for fut in pending:
+                        if fut.cancel():                         # לא התחיל – נשאר בתור לסבב הבא
+                            futures[fut].inflight = False
+                            late += 1
+                    if pending:
+                        logging.warning("metrics cycle deadline: %d/%d symbols unfinished (%d deferred)",
+                                        len(pending), len(futures), late)
+                cycles += 1
+                if cycles % max(1, int(300 / tick)) == 0:        # בערך כל 5 דקות
+                    _log_freshness()
             except Exception as e:
                 logging.error("metrics loop error: %s", e)
-            time.sleep(poll_sec)
-    import threading
+            time.sleep(max(0.0, tick - (time.monotonic() - started)))
     threading.Thread(target=loop, daemon=True).start()
@@ -1,31 +1,51 @@
 # news_service.py
+import time
+import queue
 import logging
-import requests
+import threading
+from functools import lru_cache
 from datetime import datetime
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from config import FINNHUB_API_KEY
+from finnhub_client import get_json
+from session_time import get_session_label, NYSE_TZ
+
+NEWS_TTL_SEC        = 600     # תוקף בלוק חדשות לסימול
+PREFETCH_CYCLE_SEC  = 600     # מחזור רענון מלא (מפוזר לאורכו); ≥ TTL – אחרת כל סימול "טרי" בתורו ומדולג סבב שלם
+PREFETCH_IDLE_SEC   = 300     # בדיקה חוזרת כשהשוק סגור / אין סימולים
+NEWS_PENDING_TEXT   = "📰 חדשות היום: —"
+NEWS_ERROR_TEXT     = "📰 חדשות היום: שגיאה בשליפה."
 
-_session = requests.Session()
 _analyzer = SentimentIntensityAnalyzer()
 
+# ===== קאש =====
+_lock = threading.Lock()
+_cache: dict[str, tuple[str, str, float]] = {}     # {symbol: (day, block, fetched_at)}
+_refresh_q: "queue.Queue[str]" = queue.Queue()
+_refresh_pending: set[str] = set()
+_refresh_thread: threading.Thread | None = None
+
+@lru_cache(maxsize=4096)
+def _headline_score(text: str) -> float:
+    """VADER compound לכותרת – אותה כותרת לא מחושבת פעמיים."""
+    return _analyzer.polarity_scores(text).get("compound", 0.0)
+
 def _sent_emoji(texts: list[str]) -> str:
     if not texts: return "⚪"
-    scores = [_analyzer.polarity_scores(t).get("compound", 0.0) for t in texts]
+    scores = [_headline_score(t) for t in texts]
     avg = sum(scores) / len(scores)
     if avg >= 0.25: return "🟢"
     if avg <= -0.25: return "🔴"
     return "⚪"
 
-def get_today_news(symbol: str) -> str:
+def _today() -> str:
+    return datetime.utcnow().strftime('%Y-%m-%d')
+
+def _fetch_news_block(symbol: str, today: str) -> str | None:
+    """שליפה מהרשת ובניית בלוק החדשות. None בכשל (לא נשמר בקאש)."""
     try:
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        url = (
-            "https://finnhub.io/api/v1/company-news"
-            f"?symbol={symbol}&from={today}&to={today}&token={FINNHUB_API_KEY}"
-        )
-        r = _session.get(url, timeout=6)
-        r.raise_for_status()
-        res = r.json()
+        res = get_json("/company-news", {"symbol": symbol, "from": today, "to": today}, timeout=6)
+        if res is None:
+            return None
         if not res:
             return "📰 חדשות היום: אין חדשות עדכניות."
         headlines = []
@@ -37,4 +57,84 @@ def get_today_news(symbol: str) -> str:
         return "📰 חדשות היום " + senti + ":\n" + "\n".join([f"• 🔹 {h}" for h in headlines])
     except Exception as e:
         logging.error("News fetch error for %s: %s", symbol, e)
-        return "📰 חדשות היום: שגיאה בשליפה."
+        return None
+
+def refresh_news(symbol: str) -> str | None:
+    """שליפה סינכרונית ועדכון הקאש."""
+    today = _today()
+    block = _fetch_news_block(symbol, today)
+    if block is not None:
+        with _lock:
+            _cache[symbol] = (today, block, time.time())
+    return block
+
+def _refresh_worker():
+    while True:
+        symbol = _refresh_q.get()
+        try:
+            refresh_news(symbol)
+        finally:
+            with _lock:
+                _refresh_pending.discard(symbol)
+
+def _schedule_refresh(symbol: str):
+    global _refresh_thread
+    with _lock:
+        if symbol in _refresh_pending:
+            return
+        _refresh_pending.add(symbol)
+        if _refresh_thread is None:
+            _refresh_thread = threading.Thread(target=_refresh_worker, name="news-refresh", daemon=True)
+            _refresh_thread.start()
+    _refresh_q.put(symbol)
+
+def _is_fresh(rec, today: str, now: float) -> bool:
+    return rec is not None and rec[0] == today and now - rec[2] < NEWS_TTL_SEC
+
+def get_today_news(symbol: str) -> str:
+    """
+    בלוק חדשות היום מהקאש – לעולם לא ממתין לרשת. פג תוקף → הבלוק הקיים + רענון ברקע;
+    אין כלום בקאש → "—" + רענון ברקע (ה-prefetcher אמור למנוע את זה לסימולים במעקב).
+    """
+    today = _today()
+    with _lock:
+        rec = _cache.get(symbol)
+    if _is_fresh(rec, today, time.time()):
+        return rec[1]
+    _schedule_refresh(symbol)
+    if rec is not None and rec[0] == today:
+        return rec[1]
+    return NEWS_PENDING_TEXT
+
+def _market_open() -> bool:
+    """pre/regular/post ביום חול (get_session_label לא מכיר סופי שבוע)."""
+    return datetime.now(NYSE_TZ).weekday() < 5 and get_session_label() != "closed"
+
+def start_news_prefetch(get_symbols, cycle_sec: int = PREFETCH_CYCLE_SEC):
+    """
+    רענון רקע לכל הסימולים במעקב (get_symbols() → list[str]), מפוזר לאורך cycle_sec
+    כדי לא לייצר burst של בקשות. סימול עם בלוק טרי מדולג. רץ רק כשהשוק פתוח (כולל pre/post).
+    תקציב: סימול אחד לכל cycle_sec/N שניות – 50 סימולים ב-600s ≈ 5 קריאות /company-news לדקה
+    (~8% מ-FINNHUB_CALLS_PER_MIN=60, המשותף לסורק ולפולינג), ואפס בלילות ובסופי שבוע.
+    """
+    def loop():
+        while True:
+            symbols = list(get_symbols() or [])
+            if not symbols or not _market_open():
+                time.sleep(PREFETCH_IDLE_SEC)
+                continue
+            gap = cycle_sec / len(symbols)
+            for sym in symbols:
+                if not _market_open():
+                    break                 # השוק נסגר באמצע סבב
+                t0 = time.monotonic()
+                with _lock:
+                    rec = _cache.get(sym)
+                if not _is_fresh(rec, _today(), time.time()):
+                    try:
+                        refresh_news(sym)
+                    except Exception as e:
+                        logging.error("news prefetch failed for %s: %s", sym, e)
+                time.sleep(max(0.0, gap - (time.monotonic() - t0)))
+
+    threading.Thread(target=loop, name="news-prefetch", daemon=True).start()
@@ -0,0 +1,142 @@
+# rate_limiter.py
+# -*- coding: utf-8 -*-
+"""
+הגבלת קצב משותפת לכל התהליך:
+TokenBucket – קצב ממוצע + burst; AIMDConcurrency – מספר בקשות במקביל שגדל
+בהדרגה בהצלחות ונחתך בחצי על 429; AdaptiveLimiter – שילוב של השניים,
+כולל הורדת קצב וכיבוד Retry-After.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+class TokenBucket:
+    """דלי אסימונים חוסם: acquire() ממתין עד שיש אסימון (או עד סוף pause)."""
+
+    def __init__(self, rate_per_sec: float, burst: float):
+        self.rate = float(rate_per_sec)
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """לוקח אסימון אם אפשר ומחזיר 0; אחרת מחזיר כמה שניות לחכות."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """עצירה מוחלטת ל-seconds (למשל לפי Retry-After) ואיפוס ה-burst."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._ts = now
+
+    def set_rate(self, rate_per_sec: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate_per_sec)
+
+class AIMDConcurrency:
+    """חלון מקביליות אדפטיבי: +increase/limit לכל הצלחה, ×decrease על throttle."""
+
+    def __init__(self, initial: float, min_limit: float = 1.0, max_limit: float = 16.0,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown_sec: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown_sec = cooldown_sec
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            before = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            if int(self.limit) > before:
+                self._cond.notify()
+
+    def on_throttle(self) -> bool:
+        """מחזיר True אם החלון אכן הוקטן (פעם אחת לכל cooldown – 429-ים במקביל נספרים כאירוע אחד)."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_sec:
+                return False
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            return True
+
+class AdaptiveLimiter:
+    """TokenBucket + AIMDConcurrency. הקצב יורד על 429 וחוזר בהדרגה עד max_rate_per_sec."""
+
+    def __init__(self, max_rate_per_sec: float, burst: float, max_concurrency: int,
+                 min_rate_per_sec: float = 0.2, rate_decrease: float = 0.7, rate_recovery: float = 0.01):
+        self.max_rate = float(max_rate_per_sec)
+        self.min_rate = float(min_rate_per_sec)
+        self.rate_decrease = rate_decrease
+        self.rate_recovery = rate_recovery
+        self.bucket = TokenBucket(max_rate_per_sec, burst)
+        self.concurrency = AIMDConcurrency(initial=max(1, max_concurrency // 2), max_limit=max_concurrency)
+        self.throttled = 0
+
+    @contextmanager
+    def slot(self):
+        self.concurrency.acquire()
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            self.concurrency.release()
+
+    def on_success(self):
+        self.concurrency.on_success()
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate * self.rate_recovery))
+
+    def on_throttle(self, retry_after: float | None):
+        self.throttled += 1
+        if self.concurrency.on_throttle():
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.rate_decrease))
+        self.bucket.pause(retry_after if retry_after is not None else 1.0)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_sec": round(self.bucket.rate, 3),
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "inflight": self.concurrency.inflight,
+            "throttled": self.throttled,
+        }
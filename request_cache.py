@@ -0,0 +1,87 @@
+# request_cache.py
+# -*- coding: utf-8 -*-
+"""
+שכבת memoization לבקשות HTTP: קאש LRU עם TTL לכל רשומה + single-flight
+(בקשות זהות שרצות במקביל מתאחדות לקריאת רשת אחת).
+"""
+import time
+import threading
+from collections import OrderedDict
+
+class TTLCache:
+    """LRU עם תפוגה לכל מפתח. בטוח לשימוש מכמה threads."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()   # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> tuple[bool, object]:
+        now = time.monotonic()
+        with self._lock:
+            rec = self._data.get(key)
+            if rec is None or rec[0] <= now:
+                if rec is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, rec[1]
+
+    def set(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """מאחד קריאות מקבילות עם אותו מפתח – רק ה"מוביל" מבצע את fn, השאר מחכים לתוצאה."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.event.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,49 @@
+# rescan_scheduler.py
+# -*- coding: utf-8 -*-
+"""
+סריקה חוזרת ברקע: מריץ את הסורק כל RESCAN_INTERVAL_SEC, משווה לרשימה החיה
+ומחליף מנויים על החיבור הפתוח (websocket_handler.update_watchlist).
+הסריקה החוזרת זולה – היקום, הפונדמנטלים ותשובות ה-REST כבר בקאש, והסימולים
+שבמעקב נבדקים ראשונים.
+"""
+import time
+import logging
+import threading
+from config import RESCAN_INTERVAL_SEC
+from session_time import get_session_label
+from stock_fetcher import get_microcap_symbols
+from websocket_handler import current_symbols, update_watchlist
+from telegram_service import send_to_telegram
+
+def _rescan_once(limit: int, priority_symbols: list[str]):
+    watched = current_symbols()
+    priority = watched + [s for s in priority_symbols if s not in set(watched)]
+    fresh = get_microcap_symbols(limit=limit, priority_symbols=priority)
+    if not fresh:
+        # סריקה ריקה (למשל כשל API) – לא מרוקנים את הרשימה הקיימת
+        logging.warning("rescan returned no candidates – keeping current watchlist")
+        return
+
+    added, removed = update_watchlist(fresh)
+    if added or removed:
+        parts = []
+        if added:   parts.append("➕ " + ", ".join(added[:12]) + ("..." if len(added) > 12 else ""))
+        if removed: parts.append("➖ " + ", ".join(removed[:12]) + ("..." if len(removed) > 12 else ""))
+        send_to_telegram("🔄 רשימת המעקב עודכנה:\n" + "\n".join(parts))
+
+def start_rescan(limit: int = 50, priority_symbols: list[str] | None = None,
+                 interval_sec: int = RESCAN_INTERVAL_SEC):
+    """לולאת רקע לסריקה חוזרת. מחוץ לשעות המסחר (closed) לא סורקים."""
+    priority_symbols = list(priority_symbols or [])
+
+    def loop():
+        while True:
+            time.sleep(interval_sec)
+            if get_session_label() == "closed":
+                continue
+            try:
+                _rescan_once(limit, priority_symbols)
+            except Exception as e:
+                logging.error("rescan failed: %s", e)
+
+    threading.Thread(target=loop, daemon=True).start()
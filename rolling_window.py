@@ -0,0 +1,105 @@
+# rolling_window.py
+# -*- coding: utf-8 -*-
+"""
+חלון זמן מתגלגל על גבי ring buffer של array('d') – זמנים ומחירים.
+סכום רץ נותן ממוצע ב-O(1) לכל טיק; ה-buffer מוכפל לפי הצורך והזיכרון חסום ב-capacity.
+"""
+from array import array
+
+class RollingWindow:
+    """
+    window_sec – אורך החלון בשניות; capacity – מקסימום דגימות (הישנה נזרקת כשמלא);
+    initial – גודל ההקצאה הראשונית (מוכפל עד capacity, כך שסימול שקט לא תופס את כל התקרה).
+    merge_same_second – טיקים באותה שנייה מתמזגים לדגימה אחת (המחיר האחרון),
+    כך ש-30 דק' דורשות לכל היותר 1800 דגימות גם במניה סחירה מאוד.
+    """
+    __slots__ = ("window_sec", "capacity", "merge_same_second",
+                 "_ts", "_px", "_alloc", "_head", "_size", "_sum", "_writes")
+
+    def __init__(self, window_sec: float, capacity: int = 2048, merge_same_second: bool = False,
+                 initial: int = 256):
+        self.window_sec = float(window_sec)
+        self.capacity = int(capacity)
+        self.merge_same_second = merge_same_second
+        self._alloc = max(1, min(int(initial), self.capacity))
+        self._ts = array("d", bytes(8 * self._alloc))
+        self._px = array("d", bytes(8 * self._alloc))
+        self._head = 0
+        self._size = 0
+        self._sum = 0.0
+        self._writes = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _pop_oldest(self):
+        self._sum -= self._px[self._head]
+        self._head = (self._head + 1) % self._alloc
+        self._size -= 1
+        if self._size == 0:
+            self._sum = 0.0
+
+    def _evict(self, now_ts: float):
+        ts = self._ts
+        while self._size and now_ts - ts[self._head] > self.window_sec:
+            self._pop_oldest()
+
+    def _resum(self):
+        """חישוב מחדש של הסכום – מונע הצטברות שגיאת float בסכום הרץ."""
+        total = 0.0
+        i, px, cap = self._head, self._px, self._alloc
+        for _ in range(self._size):
+            total += px[i]
+            i = (i + 1) % cap
+        self._sum = total
+
+    def _grow(self):
+        """הכפלת ה-buffer (עד capacity) – הדגימות מועתקות לפי הסדר, מהישנה בהתחלה."""
+        alloc = min(self._alloc * 2, self.capacity)
+        order = [(self._head + k) % self._alloc for k in range(self._size)]
+        ts = array("d", (self._ts[i] for i in order))
+        px = array("d", (self._px[i] for i in order))
+        ts.extend([0.0] * (alloc - self._size))
+        px.extend([0.0] * (alloc - self._size))
+        self._ts, self._px, self._alloc, self._head = ts, px, alloc, 0
+
+    def push(self, ts: float, price: float):
+        if self._size and self.merge_same_second:
+            last = (self._head + self._size - 1) % self._alloc
+            if int(self._ts[last]) == int(ts):
+                self._sum += price - self._px[last]
+                self._px[last] = price
+                self._ts[last] = ts
+                self._evict(ts)
+                return
+
+        if self._size == self._alloc:
+            if self._alloc < self.capacity:
+                self._grow()
+            else:
+                self._pop_oldest()
+        cap = self._alloc
+        idx = (self._head + self._size) % cap
+        self._ts[idx] = ts
+        self._px[idx] = price
+        self._size += 1
+        self._sum += price
+        self._evict(ts)
+
+        self._writes += 1
+        if self._writes >= cap:
+            self._writes = 0
+            self._resum()
+
+    def mean(self) -> float | None:
+        return self._sum / self._size if self._size else None
+
+    def last_ts(self) -> float | None:
+        if not self._size:
+            return None
+        return self._ts[(self._head + self._size - 1) % self._alloc]
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self._sum = 0.0
@@ -1,11 +1,16 @@
 # stock_fetcher.py
 # -*- coding: utf-8 -*-
 import time
-import requests
+import heapq
+import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import FINNHUB_API_KEY
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from finnhub_client import get_json, cache_stats, limiter_stats
+from symbol_universe import get_scan_universe
+import fundamentals_store
+from filter_planner import FilterPlanner
+from telemetry import SCAN_STAGE_SECONDS, SCAN_RESULTS, SCAN_LAST
 
 # ===== קריטריונים קשיחים =====
 MIN_PRICE_USD        = 0.30
@@ -16,6 +21,7 @@ MIN_SHORT_FLOAT_PCT  = 10.0
 
 # ===== ספים רכים לניקוד =====
 MIN_SCORE            = 50                # Tier B מתחיל מ-50; A מ-70
+MAX_SCORE            = 100
 RVOL_TARGETS         = (1.5, 2.5)        # 1.5x / 2.5x
 GAP_TARGETS_PCT      = (1.0, 40.0)       # GapUp "סביר" לעבודה
 ATR_TARGETS_PCT      = (4.0, 25.0)       # ATR% "בריא"
@@ -25,78 +31,43 @@ GOOD_AVG_DOLLAR_VOL  = 1_000_000
 # ===== עומסי עבודה ורשת =====
 MAX_WORKERS_STAGE1   = 6
 MAX_WORKERS_STAGE2   = 4
-REQUEST_TIMEOUT      = 12
-
-# ===== HTTP =====
-def _safe_get_json(url, timeout=REQUEST_TIMEOUT):
-    try:
-        r = requests.get(url, timeout=timeout)
-        if r.status_code == 429:
-            time.sleep(0.8)
-            r = requests.get(url, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        logging.error("GET failed for %s: %s", url, e)
-        return None
+SCAN_QUEUE_SIZE      = 32                # תור חסום בין שלב 1 לשלב 2
 
 # ===== עזרי נתונים =====
 def _get_quote(symbol: str):
-    return _safe_get_json(f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={FINNHUB_API_KEY}")
+    return get_json("/quote", {"symbol": symbol})
 
-def _get_profile(symbol: str):
-    return _safe_get_json(f"https://finnhub.io/api/v1/stock/profile2?symbol={symbol}&token={FINNHUB_API_KEY}")
+def _get_candles(symbol: str, resolution: str, ts_from: int, ts_to: int):
+    return get_json("/stock/candle", {"symbol": symbol, "resolution": resolution, "from": ts_from, "to": ts_to})
 
-def _get_metric(symbol: str):
-    return _safe_get_json(f"https://finnhub.io/api/v1/stock/metric?symbol={symbol}&metric=all&token={FINNHUB_API_KEY}")
+def _aligned_now(step_sec: int) -> int:
+    """now מעוגל כלפי מעלה ל-step – כך שקריאות חוזרות בונות URL זהה ופוגעות בקאש."""
+    now = int(datetime.now(timezone.utc).timestamp())
+    return (now // step_sec + 1) * step_sec
 
-def _get_candles(symbol: str, resolution: str, ts_from: int, ts_to: int):
-    url = (f"https://finnhub.io/api/v1/stock/candle?symbol={symbol}"
-           f"&resolution={resolution}&from={ts_from}&to={ts_to}&token={FINNHUB_API_KEY}")
-    return _safe_get_json(url)
+def _get_daily_candles(symbol: str, days: int = 35):
+    """נרות יומיים ל-days אחורה. משותף ל-ATR%, Avg$Vol ו-RVOL – בקשה אחת לסימול."""
+    _to = _aligned_now(3600)
+    _from = _to - days * 86400
+    data = _get_candles(symbol, "D", _from, _to)
+    if not data or data.get("s") != "ok":
+        return None
+    return data
 
 def _get_intraday_volume(symbol: str, minutes_back: int = 240) -> int:
     """נפח אינטרדיי מצטבר (כולל פרה-מרקט) ברזולוציית 5 דק'."""
-    now = datetime.now(timezone.utc)
-    _from = int((now - timedelta(minutes=minutes_back)).timestamp())
-    _to   = int(now.timestamp())
+    _to = _aligned_now(60)
+    _from = _to - minutes_back * 60
     data = _get_candles(symbol, "5", _from, _to)
     if not data or data.get("s") != "ok":
         return 0
     vols = data.get("v") or []
     return int(sum(vols))
 
-def _extract_short_float(metric_json: dict) -> float | None:
-    """מחלץ Short Float% (0–100) מתוך metric – מנסה כמה שמות-שדה נפוצים."""
-    if not metric_json:
-        return None
-    m = metric_json.get("metric") or {}
-    candidates = [
-        "shortPercentFloat", "ShortPercentFloat",
-        "shortRatio", "ShortRatio",
-        "ShortInterestFloat", "shortInterestFloat",
-        "shortInterestPercentFloat", "ShortPercentOfFloat"
-    ]
-    for k in candidates:
-        val = m.get(k)
-        if val is None:
-            continue
-        try:
-            val = float(val)
-            if val <= 1.0:  # לפעמים מגיע ביחס (0–1)
-                val *= 100.0
-            return val
-        except Exception:
-            continue
-    return None
-
 def _atr_percent(symbol: str, days: int = 30) -> float | None:
     """ATR(14) כאחוז מהמחיר האחרון, על בסיס נרות יומיים."""
-    now = datetime.now(timezone.utc)
-    _from = int((now - timedelta(days=days+5)).timestamp())
-    _to   = int(now.timestamp())
-    data = _get_candles(symbol, "D", _from, _to)
-    if not data or data.get("s") != "ok":
+    data = _get_daily_candles(symbol, days=days + 5)
+    if not data:
         return None
     o, h, l, c = data.get("o", []), data.get("h", []), data.get("l", []), data.get("c", [])
     n = min(len(o), len(h), len(l), len(c))
@@ -118,11 +89,8 @@ def _atr_percent(symbol: str, days: int = 30) -> float | None:
 
 def _avg_dollar_volume_10d(symbol: str) -> float | None:
     """ממוצע Dollar-Volume ל-10 ימים (נרות יומיים)."""
-    now = datetime.now(timezone.utc)
-    _from = int((now - timedelta(days=30)).timestamp())
-    _to   = int(now.timestamp())
-    data = _get_candles(symbol, "D", _from, _to)
-    if not data or data.get("s") != "ok":
+    data = _get_daily_candles(symbol)
+    if not data:
         return None
     c = data.get("c") or []
     v = data.get("v") or []
@@ -172,78 +140,122 @@ def _score(entry: dict) -> int:
     if momentum is not None and momentum >= 3.0:
         score += 10
 
-    return min(score, 100)
-
-# ===== שלבים =====
-def _stage1_basic_filters(symbol: str) -> dict | None:
-    """שלב 1 – בדיקות מהירות: MarketCap + מחיר (ציטוט) + Gap + Momentum."""
-    profile = _get_profile(symbol)
-    if not profile:
-        return None
-    mcap = profile.get("marketCapitalization") or 0
+    return min(score, MAX_SCORE)
+
+# ערכים "אופטימיים" לשדות שעוד לא נמדדו – כל אחד מקבל את מלוא הנקודות ב-_score
+_BEST_CASE_FIELDS = {
+    "short_float": 100.0,
+    "rvol": float("inf"),
+    "gap_pct": 10.0,
+    "atr_pct": 10.0,
+    "avg_dollar_vol_10d": float("inf"),
+    "momentum_from_open_pct": float("inf"),
+}
+
+def _score_upper_bound(entry: dict) -> int:
+    """הציון המקסימלי שהסימול עוד יכול לקבל, בהינתן השדות שכבר ידועים ב-entry."""
+    best = {k: (entry[k] if k in entry else v) for k, v in _BEST_CASE_FIELDS.items()}
+    return _score(best)
+
+# ===== קריטריונים קשיחים (כל בדיקה מעשירה את entry) =====
+def _check_market_cap(entry: dict) -> bool:
+    # MarketCap מהמאגר המקומי – רוב היקום נדחה כאן בלי קריאת רשת
+    mcap = fundamentals_store.get_market_cap(entry["symbol"]) or 0
     if mcap <= 0 or mcap > MAX_MARKET_CAP_USD:
-        return None
+        return False
+    entry["market_cap"] = float(mcap)
+    return True
 
-    quote = _get_quote(symbol)
+def _check_price_band(entry: dict) -> bool:
+    quote = _get_quote(entry["symbol"])
     if not quote:
-        return None
+        return False
 
     c = quote.get("c"); o = quote.get("o"); pc = quote.get("pc")
     if c is None or o is None or pc is None:
-        return None
+        return False
     c = float(c); o = float(o); pc = float(pc)
 
     if c < MIN_PRICE_USD or c > MAX_PRICE_USD:
-        return None
-
-    momentum_from_open_pct = ((c - o) / o) * 100.0 if o > 0 else 0.0
-    gap_pct = ((c - pc) / pc) * 100.0 if pc > 0 else None
+        return False
 
-    return {
-        "symbol": symbol,
+    entry.update({
         "open": o,
         "price": c,
-        "market_cap": float(mcap),
-        "gap_pct": gap_pct,
-        "momentum_from_open_pct": momentum_from_open_pct,
+        "gap_pct": ((c - pc) / pc) * 100.0 if pc > 0 else None,
+        "momentum_from_open_pct": ((c - o) / o) * 100.0 if o > 0 else 0.0,
         "prev_close": pc,  # לשימוש SSR בהודעות WS
-    }
-
-def _stage2_deep_filters(entry: dict) -> dict | None:
-    """שלב 2 – Short Float + Intraday Volume + RVOL + ATR% + Avg$Vol(10d) + ניקוד."""
-    symbol = entry["symbol"]
+    })
+    return True
 
-    metric = _get_metric(symbol)
-    short_float = _extract_short_float(metric)
+def _check_short_float(entry: dict) -> bool:
+    short_float = fundamentals_store.get_short_float(entry["symbol"])
     if short_float is None or short_float < MIN_SHORT_FLOAT_PCT:
-        return None
+        return False
+    entry["short_float"] = short_float
+    return True
 
-    intraday_vol = _get_intraday_volume(symbol, minutes_back=240)
+def _check_intraday_volume(entry: dict) -> bool:
+    intraday_vol = _get_intraday_volume(entry["symbol"], minutes_back=240)
     if intraday_vol < MIN_INTRADAY_VOLUME:
+        return False
+    entry["intraday_volume"] = int(intraday_vol)
+    return True
+
+# סדר הבדיקות נקבע דינמית לפי שיעור מעבר וזמן שנמדדו (ה-prior משחזר את הסדר המקורי)
+_STAGE1_PLAN = FilterPlanner("stage1", [
+    ("market_cap",      _check_market_cap,      0.30, 0.05),
+    ("price_band",      _check_price_band,      0.40, 0.30),
+])
+_STAGE2_PLAN = FilterPlanner("stage2", [
+    ("short_float",     _check_short_float,     0.30, 0.30),
+    ("intraday_volume", _check_intraday_volume, 0.50, 0.50),
+])
+
+# ===== שלבים =====
+def _stage1_basic_filters(symbol: str) -> dict | None:
+    """שלב 1 – בדיקות מהירות: MarketCap + מחיר (ציטוט) + Gap + Momentum."""
+    entry = {"symbol": symbol}
+    return entry if _STAGE1_PLAN.run(entry) else None
+
+def _stage2_deep_filters(entry: dict, score_to_beat=None) -> dict | None:
+    """
+    שלב 2 – Short Float + Intraday Volume + RVOL + ATR% + Avg$Vol(10d) + ניקוד.
+    score_to_beat (אופציונלי) – פונקציה שמחזירה את הציון ה-K הטוב ביותר עד כה (או None).
+    לפני כל קריאה יקרה נבדק הציון המקסימלי האפשרי; אם הוא לא עוקף – מדלגים (pruned_at).
+    """
+    symbol = entry["symbol"]
+
+    def _pruned(stage: str) -> bool:
+        bound = _score_upper_bound(entry)
+        kth = score_to_beat() if score_to_beat else None
+        if bound < MIN_SCORE or (kth is not None and bound <= kth):
+            entry["pruned_at"] = stage
+            return True
+        return False
+
+    if not _STAGE2_PLAN.run(entry, before_each=_pruned):
         return None
 
+    if _pruned("daily"):
+        return None
     avg_daily_vol_10d_dollar = _avg_dollar_volume_10d(symbol)
     atr_pct = _atr_percent(symbol, days=30)
 
-    # RVOL ביחידות מניה (מול ממוצע 10 ימים)
-    now = datetime.now(timezone.utc)
-    _from = int((now - timedelta(days=30)).timestamp())
-    _to   = int(now.timestamp())
-    ddata = _get_candles(symbol, "D", _from, _to)
+    # RVOL ביחידות מניה (מול ממוצע 10 ימים) – אותם נרות יומיים מהקאש
+    ddata = _get_daily_candles(symbol)
     avg_vol_10d_units = None
-    if ddata and ddata.get("s") == "ok":
+    if ddata:
         vols = ddata.get("v") or []
         if len(vols) >= 10:
             avg_vol_10d_units = sum(vols[-10:]) / 10.0
 
     if avg_vol_10d_units and avg_vol_10d_units > 0:
-        rvol = intraday_vol / avg_vol_10d_units
+        rvol = entry["intraday_volume"] / avg_vol_10d_units
     else:
         rvol = None
 
     entry.update({
-        "short_float": short_float,
-        "intraday_volume": int(intraday_vol),
         "avg_dollar_vol_10d": float(avg_daily_vol_10d_dollar) if avg_daily_vol_10d_dollar else None,
         "atr_pct": float(atr_pct) if atr_pct is not None else None,
         "rvol": float(rvol) if rvol is not None else None,
@@ -255,70 +267,138 @@ def _stage2_deep_filters(entry: dict) -> dict | None:
 
     return entry
 
+# ===== צנרת סריקה (asyncio) =====
+async def _scan_pipeline(ordered: list[str], limit: int) -> list[dict]:
+    """
+    שלב 1 ושלב 2 רצים במקביל: כל שורד של שלב 1 נכנס מיד לתור חסום (SCAN_QUEUE_SIZE)
+    ומשם לשלב 2. נשמרים ה-limit הטובים ביותר (heap); מועמד שהציון המקסימלי שלו
+    לא עוקף את ה-K מדולג בלי הקריאות היקרות, וכשה-K מגיע ל-MAX_SCORE – הכל מבוטל.
+    הקריאות עצמן רצות ב-executor, כך שמגביל הקצב והקאש של finnhub_client משותפים לכולן.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+    enough = asyncio.Event()
+    top: list[tuple[int, int, dict]] = []    # min-heap של (score, seq, entry) בגודל ≤ limit
+    kth = {"score": None}                     # הציון ה-K (נקרא גם מתוך threads של שלב 2)
+    symbols = iter(ordered)
+    stats = {"stage1": 0, "stage2": 0, "pruned": 0, "seq": 0}
+    t0 = time.monotonic()
+    score_to_beat = lambda: kth["score"]
+
+    pool1 = ThreadPoolExecutor(max_workers=MAX_WORKERS_STAGE1, thread_name_prefix="scan-s1")
+    pool2 = ThreadPoolExecutor(max_workers=MAX_WORKERS_STAGE2, thread_name_prefix="scan-s2")
+
+    async def stage1_worker():
+        # שלב 1 – MarketCap + Price + Gap + Momentum
+        for sym in symbols:
+            t_start = time.perf_counter()
+            try:
+                res = await loop.run_in_executor(pool1, _stage1_basic_filters, sym)
+            except Exception as e:
+                logging.error("Stage1 failed for %s: %s", sym, e)
+                SCAN_RESULTS.inc("stage1", "error")
+                continue
+            finally:
+                SCAN_STAGE_SECONDS.observe("stage1", value=time.perf_counter() - t_start)
+            SCAN_RESULTS.inc("stage1", "passed" if res else "rejected")
+            if res:
+                stats["stage1"] += 1
+                await queue.put(res)
+
+    async def stage2_worker():
+        # שלב 2 – Short Float + Volume + RVOL + ATR% + Avg$Vol + Score
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            t_start = time.perf_counter()
+            try:
+                res = await loop.run_in_executor(pool2, _stage2_deep_filters, row, score_to_beat)
+            except Exception as e:
+                logging.error("Stage2 failed for %s: %s", row["symbol"], e)
+                SCAN_RESULTS.inc("stage2", "error")
+                continue
+            finally:
+                SCAN_STAGE_SECONDS.observe("stage2", value=time.perf_counter() - t_start)
+            if not res:
+                if row.get("pruned_at"):
+                    stats["pruned"] += 1
+                SCAN_RESULTS.inc("stage2", "pruned" if row.get("pruned_at") else "rejected")
+                continue
+            SCAN_RESULTS.inc("stage2", "passed")
+            stats["stage2"] += 1
+            # שיוך שכבה
+            res["tier"] = "A" if res["score"] >= 70 else "B"
+            if not top:
+                logging.info("First candidate %s after %.1fs", res["symbol"], time.monotonic() - t0)
+            stats["seq"] += 1
+            item = (res["score"], stats["seq"], res)
+            if len(top) < limit:
+                heapq.heappush(top, item)
+            elif res["score"] > top[0][0]:
+                heapq.heapreplace(top, item)
+            if len(top) >= limit:
+                kth["score"] = top[0][0]
+                if kth["score"] >= MAX_SCORE:
+                    enough.set()   # אף מועמד נוסף לא יכול לעקוף – אין טעם להמשיך
+                    return
+
+    async def feed_stage2():
+        await asyncio.gather(*s1_tasks)
+        for _ in s2_tasks:
+            await queue.put(None)   # סוף הזרם
+
+    s1_tasks = [asyncio.create_task(stage1_worker()) for _ in range(MAX_WORKERS_STAGE1)]
+    s2_tasks = [asyncio.create_task(stage2_worker()) for _ in range(MAX_WORKERS_STAGE2)]
+    feeder = asyncio.create_task(feed_stage2())
+    enough_wait = asyncio.create_task(enough.wait())
+    all_stage2 = asyncio.gather(*s2_tasks)
+    try:
+        await asyncio.wait({enough_wait, all_stage2}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # ביטול אמיתי: משימות asyncio + כל מה שעוד ממתין ב-executors
+        for t in (*s1_tasks, *s2_tasks, feeder, enough_wait):
+            t.cancel()
+        await asyncio.gather(*s1_tasks, *s2_tasks, feeder, enough_wait, all_stage2, return_exceptions=True)
+        pool1.shutdown(wait=False, cancel_futures=True)
+        pool2.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - t0
+    SCAN_LAST.set("duration_sec", value=round(elapsed, 3))
+    SCAN_LAST.set("selected", value=len(top))
+    logging.info("Stage1 passed: %d | Stage2 passed: %d | pruned: %d | %.1fs",
+                 stats["stage1"], stats["stage2"], stats["pruned"], elapsed)
+    return [entry for _, _, entry in top]
+
 # ===== API ראשי =====
 def get_microcap_symbols(limit=50, priority_symbols: list[str] | None = None):
     """
     מחזיר עד limit מניות US שעומדות בקריטריונים:
     Price ∈ [0.30, 15], MarketCap ≤ 1.5B, ShortFloat ≥ 10%, Intraday Volume ≥ 50k,
-    + ניקוד איכות ≥ 50 (Tier B) או ≥ 70 (Tier A). ממויין לפי ציון יורד.
+    + ניקוד איכות ≥ 50 (Tier B) או ≥ 70 (Tier A). ה-limit בעלי הציון הגבוה ביותר, ממויין לפי ציון יורד.
     priority_symbols (אופציונלי) – רשימת טיקרים לבדיקה מוקדמת (למשל מיוטיוב).
     """
-    base = _safe_get_json(f"https://finnhub.io/api/v1/stock/symbol?exchange=US&token={FINNHUB_API_KEY}") or []
-    logging.info("✅ Fetched %d US symbols.", len(base))
-
-    # דילוג על Warrants/Units/Preferred
-    universe = []
-    for s in base:
-        sym = s.get("symbol") or ""
-        desc = (s.get("description") or "").upper()
-        if not sym:
-            continue
-        if any(x in desc for x in ("WARRANT", "UNIT", "PREF", "PREFERRED")):
-            continue
-        universe.append(sym)
+    # יקום מסונן מראש (Warrants/Units/Preferred) מתוך snapshot מקומי
+    universe = get_scan_universe()
+    universe_set = set(universe)
+    logging.info("✅ US scan universe: %d symbols.", len(universe))
 
     # סדר עדיפות: קודם priority_symbols (אם נמסרו), אחר כך שאר היקום
     seen = set()
     ordered = []
     if priority_symbols:
         for s in priority_symbols:
-            if s in universe and s not in seen:
+            if s in universe_set and s not in seen:
                 ordered.append(s); seen.add(s)
     for s in universe:
         if s not in seen:
             ordered.append(s)
 
-    # שלב 1 – MarketCap + Price + Gap + Momentum
-    stage1 = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS_STAGE1) as ex:
-        futs = {ex.submit(_stage1_basic_filters, sym): sym for sym in ordered}
-        for f in as_completed(futs):
-            try:
-                res = f.result()
-                if res:
-                    stage1.append(res)
-            except Exception as e:
-                logging.error("Stage1 failed for %s: %s", futs[f], e)
-
-    logging.info("Stage1 passed: %d", len(stage1))
-
-    # שלב 2 – Short Float + Volume + RVOL + ATR% + Avg$Vol + Score
-    selected = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS_STAGE2) as ex:
-        futs = {ex.submit(_stage2_deep_filters, row): row["symbol"] for row in stage1}
-        for f in as_completed(futs):
-            try:
-                res = f.result()
-                if res:
-                    # שיוך שכבה
-                    res["tier"] = "A" if res["score"] >= 70 else "B"
-                    selected.append(res)
-                    if len(selected) >= limit:
-                        break
-            except Exception as e:
-                logging.error("Stage2 failed for %s: %s", futs[f], e)
+    selected = asyncio.run(_scan_pipeline(ordered, limit))
 
     # מיון לפי ציון יורד
     selected.sort(key=lambda x: x.get("score", 0), reverse=True)
-    logging.info("✅ Total selected: %d", len(selected))
+    _STAGE1_PLAN.save(); _STAGE2_PLAN.save()
+    logging.info("✅ Total selected: %d | request cache: %s | limiter: %s | plans: %s %s",
+                 len(selected), cache_stats(), limiter_stats(), _STAGE1_PLAN.summary(), _STAGE2_PLAN.summary())
     return selected[:limit]
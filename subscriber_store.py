@@ -0,0 +1,148 @@
+# subscriber_store.py
+# -*- coding: utf-8 -*-
+"""
+מאגר מנויים משותף ל-webhook_server (תהליך נפרד) ול-telegram_service.
+SQLite במצב WAL: כתיבה של /start או /stop היא שורה אחת, בלי לשכתב קובץ ובלי
+להתנגש בקורא. הרשימה נטענת פעם אחת לזיכרון; שינויים מתהליך אחר מזוהים דרך
+PRAGMA data_version (בדיקה זולה בלי לקרוא את הטבלה) ורק אז נטען מחדש –
+יחד עם העדפות המנויים ואינדקס הניתוב (alert_routing).
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from config import SUBSCRIBERS_DB
+from alert_routing import RoutingIndex
+
+LEGACY_JSON_FILE = "subscribers.json"   # ייבוא חד-פעמי מהפורמט הישן
+_PREF_COLUMNS = ("chat_id", "tiers", "alert_types", "tickers", "min_price", "max_price")
+
+class SubscriberStore:
+    def __init__(self, path: str = SUBSCRIBERS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._chat_ids: tuple[str, ...] = ()
+        self._prefs: dict[str, dict] = {}
+        self._routing = RoutingIndex([])
+        self._data_version = None
+
+    def _open_locked(self):
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS subscribers ("
+                     "chat_id TEXT PRIMARY KEY, created_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS subscribers_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS subscriber_prefs ("
+                     "chat_id TEXT PRIMARY KEY, tiers TEXT, alert_types TEXT, tickers TEXT, "
+                     "min_price REAL, max_price REAL)")
+        self._conn = conn
+        self._import_legacy_locked()
+        self._reload_locked()
+
+    def _import_legacy_locked(self):
+        """ייבוא חד-פעמי (מסומן ב-meta, כדי שרשימה שהתרוקנה ב-/stop לא תיובא שוב)."""
+        if self._conn.execute("SELECT 1 FROM subscribers_meta WHERE key='legacy_imported'").fetchone():
+            return
+        legacy = []
+        if os.path.exists(LEGACY_JSON_FILE):
+            try:
+                with open(LEGACY_JSON_FILE, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                logging.error(f"שגיאה בייבוא {LEGACY_JSON_FILE}: {e}")
+                return
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO subscribers(chat_id, created_at) VALUES (?, ?)",
+                                   [(str(c), now) for c in legacy])
+            self._conn.execute("INSERT OR REPLACE INTO subscribers_meta(key, value) VALUES ('legacy_imported', ?)",
+                               (str(now),))
+        if legacy:
+            logging.info("imported %d subscribers from %s", len(legacy), LEGACY_JSON_FILE)
+
+    def _reload_locked(self):
+        rows = self._conn.execute(
+            "SELECT s.chat_id, p.tiers, p.alert_types, p.tickers, p.min_price, p.max_price "
+            "FROM subscribers s LEFT JOIN subscriber_prefs p ON p.chat_id = s.chat_id "
+            "ORDER BY s.created_at, s.chat_id").fetchall()
+        subs = [dict(zip(_PREF_COLUMNS, r)) for r in rows]
+        self._chat_ids = tuple(s["chat_id"] for s in subs)
+        self._prefs = {s["chat_id"]: s for s in subs}
+        self._routing = RoutingIndex(subs)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_locked(self):
+        """טעינה מחדש רק אם תהליך אחר שינה את ה-DB."""
+        try:
+            self._open_locked()
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._reload_locked()
+        except Exception as e:
+            logging.error(f"שגיאה בקריאת מאגר המנויים: {e}")
+
+    def all(self) -> tuple[str, ...]:
+        """רשימת המנויים מהזיכרון."""
+        with self._lock:
+            self._refresh_locked()
+            return self._chat_ids
+
+    def routing(self) -> RoutingIndex:
+        """אינדקס הניתוב העדכני (נבנה מחדש רק כשהמנויים/ההעדפות השתנו)."""
+        with self._lock:
+            self._refresh_locked()
+            return self._routing
+
+    def get_prefs(self, chat_id) -> dict | None:
+        with self._lock:
+            self._refresh_locked()
+            return self._prefs.get(str(chat_id))
+
+    def set_prefs(self, chat_id, **fields) -> bool:
+        """
+        עדכון העדפות: tiers / alert_types / tickers (מחרוזת CSV) ו-min_price / max_price.
+        ערך None מאפס את השדה ל"הכל". מחזיר False אם הצ'אט אינו מנוי.
+        """
+        unknown = set(fields) - set(_PREF_COLUMNS[1:])
+        if unknown:
+            raise ValueError(f"unknown preference fields: {sorted(unknown)}")
+        with self._lock:
+            self._open_locked()
+            chat_id = str(chat_id)
+            if not self._conn.execute("SELECT 1 FROM subscribers WHERE chat_id=?", (chat_id,)).fetchone():
+                return False
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("INSERT OR IGNORE INTO subscriber_prefs(chat_id) VALUES (?)", (chat_id,))
+                for col, value in fields.items():
+                    self._conn.execute(f"UPDATE subscriber_prefs SET {col}=? WHERE chat_id=?", (value, chat_id))
+            self._reload_locked()
+            return True
+
+    def add(self, chat_id) -> bool:
+        """מוסיף מנוי. מחזיר True אם נוסף (False אם כבר קיים)."""
+        with self._lock:
+            self._open_locked()
+            cur = self._conn.execute("INSERT OR IGNORE INTO subscribers(chat_id, created_at) VALUES (?, ?)",
+                                     (str(chat_id), time.time()))
+            if cur.rowcount:
+                self._reload_locked()   # data_version לא משתנה על כתיבה מאותו חיבור
+            return cur.rowcount > 0
+
+    def remove(self, chat_id) -> bool:
+        """מסיר מנוי. מחזיר True אם הוסר."""
+        with self._lock:
+            self._open_locked()
+            cur = self._conn.execute("DELETE FROM subscribers WHERE chat_id=?", (str(chat_id),))
+            self._conn.execute("DELETE FROM subscriber_prefs WHERE chat_id=?", (str(chat_id),))
+            if cur.rowcount:
+                self._reload_locked()
+            return cur.rowcount > 0
+
+store = SubscriberStore()
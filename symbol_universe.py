@@ -0,0 +1,107 @@
+# symbol_universe.py
+# -*- coding: utf-8 -*-
+"""
+יקום הסמלים של US – מקור יחיד ל-stock_fetcher ול-youtube_watchlist.
+הרשימה המלאה נשמרת כ-snapshot ב-SQLite עם TTL, כך שהפעלה קרה עם snapshot טרי
+לא מורידה את /stock/symbol בכלל. סינון Warrants/Units/Preferred מחושב פעם אחת
+בזמן ההורדה ונשמר כדגל.
+"""
+import time
+import sqlite3
+import logging
+import threading
+from config import CACHE_DB_PATH, UNIVERSE_TTL_SEC
+from finnhub_client import get_json
+
+EXCLUDE_DESC_WORDS = ("WARRANT", "UNIT", "PREF", "PREFERRED")
+
+_lock = threading.Lock()
+_loaded_at: float = 0.0
+_all_symbols: frozenset[str] = frozenset()
+_scan_symbols: tuple[str, ...] = ()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS universe ("
+                 "symbol TEXT PRIMARY KEY, excluded INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS universe_meta ("
+                 "key TEXT PRIMARY KEY, value REAL NOT NULL)")
+    return conn
+
+def _is_excluded(row: dict) -> bool:
+    desc = (row.get("description") or "").upper()
+    return any(x in desc for x in EXCLUDE_DESC_WORDS)
+
+def _read_snapshot() -> tuple[float, list[tuple[str, int]]]:
+    """מחזיר (fetched_at, [(symbol, excluded)]) לפי סדר ההכנסה המקורי."""
+    try:
+        with _connect() as conn:
+            meta = conn.execute("SELECT value FROM universe_meta WHERE key='fetched_at'").fetchone()
+            if not meta:
+                return 0.0, []
+            rows = conn.execute("SELECT symbol, excluded FROM universe ORDER BY rowid").fetchall()
+            return float(meta[0]), rows
+    except Exception as e:
+        logging.error("universe snapshot read failed: %s", e)
+        return 0.0, []
+
+def _write_snapshot(rows: list[tuple[str, int]], fetched_at: float):
+    try:
+        with _connect() as conn:
+            conn.execute("DELETE FROM universe")
+            conn.executemany("INSERT OR IGNORE INTO universe(symbol, excluded) VALUES (?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO universe_meta(key, value) VALUES ('fetched_at', ?)", (fetched_at,))
+    except Exception as e:
+        logging.error("universe snapshot write failed: %s", e)
+
+def _download() -> list[tuple[str, int]] | None:
+    base = get_json("/stock/symbol", {"exchange": "US"}, timeout=30)
+    if not base:
+        return None
+    rows = []
+    for s in base:
+        sym = s.get("symbol") or ""
+        if sym:
+            rows.append((sym, 1 if _is_excluded(s) else 0))
+    logging.info("✅ Fetched %d US symbols.", len(rows))
+    return rows
+
+def _install(rows: list[tuple[str, int]], loaded_at: float):
+    global _all_symbols, _scan_symbols, _loaded_at
+    _all_symbols = frozenset(sym for sym, _ in rows)
+    _scan_symbols = tuple(sym for sym, excl in rows if not excl)
+    _loaded_at = loaded_at
+
+def _ensure_loaded(force_refresh: bool = False):
+    now = time.time()
+    with _lock:
+        if not force_refresh and _scan_symbols and now - _loaded_at < UNIVERSE_TTL_SEC:
+            return
+
+        fetched_at, rows = (0.0, []) if force_refresh else _read_snapshot()
+        if rows and now - fetched_at < UNIVERSE_TTL_SEC:
+            _install(rows, fetched_at)
+            return
+
+        fresh = _download()
+        if fresh:
+            _write_snapshot(fresh, now)
+            _install(fresh, now)
+            return
+
+        # ההורדה נכשלה – עדיף snapshot ישן מאשר יקום ריק
+        if not rows:
+            fetched_at, rows = _read_snapshot()
+        if rows:
+            logging.warning("universe download failed – using stale snapshot (%.0fs old)", now - fetched_at)
+            _install(rows, fetched_at)
+
+def get_scan_universe(force_refresh: bool = False) -> list[str]:
+    """סמלים לסריקה (ללא Warrants/Units/Preferred), לפי הסדר המקורי של Finnhub."""
+    _ensure_loaded(force_refresh)
+    return list(_scan_symbols)
+
+def get_us_symbols(force_refresh: bool = False) -> frozenset[str]:
+    """כל סמלי US התקינים – לסינון ראשי תיבות רגילים (למשל ביוטיוב)."""
+    _ensure_loaded(force_refresh)
+    return _all_symbols
@@ -1,49 +1,139 @@
+import time
 import requests
 import logging
-import json
-import os
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from config import BOT_TOKEN
+from rate_limiter import TokenBucket
+from subscriber_store import store as subscriber_store
+from telemetry import TELEGRAM_SECONDS, TELEGRAM_SENDS
 
-SUBSCRIBERS_FILE = "subscribers.json"
+# ===== מגבלות טלגרם =====
+GLOBAL_MSGS_PER_SEC   = 30       # לכל הבוט
+PRIVATE_MSGS_PER_SEC  = 1.0      # לצ'אט פרטי
+GROUP_MSGS_PER_MIN    = 20       # לקבוצה/ערוץ (chat_id שלילי)
+FANOUT_WORKERS        = 16
+MAX_SEND_ATTEMPTS     = 3
+SEND_TIMEOUT          = 5
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=FANOUT_WORKERS))
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="tg-send")
+_global_bucket = TokenBucket(GLOBAL_MSGS_PER_SEC, GLOBAL_MSGS_PER_SEC)
+_chat_buckets: dict[str, TokenBucket] = {}
+
+def _chat_bucket(chat_id: str) -> TokenBucket:
+    b = _chat_buckets.get(chat_id)
+    if b is None:
+        if chat_id.startswith("-"):
+            b = TokenBucket(GROUP_MSGS_PER_MIN / 60.0, 3)
+        else:
+            b = TokenBucket(PRIVATE_MSGS_PER_SEC, 1)
+        b = _chat_buckets.setdefault(chat_id, b)
+    return b
 
 def load_subscribers():
-    """טוען את רשימת המנויים מקובץ JSON. מחזיר רשימה ריקה אם הקובץ לא קיים/פגום."""
-    if not os.path.exists(SUBSCRIBERS_FILE):
-        logging.warning("⚠️ לא נמצא קובץ subscribers.json.")
-        return []
+    """רשימת המנויים מהמאגר המשותף (בזיכרון; נטענת מחדש רק כשה-DB השתנה)."""
+    return subscriber_store.all()
+
+def _retry_after(response) -> float | None:
     try:
-        with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logging.error(f"שגיאה בקריאת קובץ מנויים: {e}")
-        return []
+        return float(response.json().get("parameters", {}).get("retry_after"))
+    except Exception:
+        return None
 
-def send_to_telegram(message: str):
-    """שולח הודעה לכל המנויים בטלגרם עם עיצוב HTML."""
-    print("🔥 מנסה לשלוח הודעה להפעלה...")
+def _send_one(chat_id: str, message: str) -> tuple[bool, str]:
+    """שליחה לצ'אט אחד תוך כיבוד מגבלות הקצב ו-retry_after. מחזיר (ok, פירוט)."""
+    t0 = time.perf_counter()
+    ok, detail = _send_one_attempts(chat_id, message)
+    TELEGRAM_SECONDS.observe(value=time.perf_counter() - t0)
+    TELEGRAM_SENDS.inc("ok" if ok else "failed")
+    return ok, detail
 
-    subscribers = load_subscribers()
-    if not subscribers:
-        logging.warning("אין מנויים לשליחה.")
-        return
-
-    for chat_id in subscribers:
+def _send_one_attempts(chat_id: str, message: str) -> tuple[bool, str]:
+    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+    payload = {
+        "chat_id": chat_id,
+        "text": message,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": True
+    }
+    bucket = _chat_bucket(chat_id)
+    detail = ""
+    for attempt in range(MAX_SEND_ATTEMPTS):
+        bucket.acquire()
+        _global_bucket.acquire()
         try:
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "HTML",
-                "disable_web_page_preview": True
-            }
-            response = requests.post(url, data=payload, timeout=5)
-
-            if response.status_code == 200:
-                print(f"✅ נשלחה הודעה ל־ {chat_id}")
-            else:
-                logging.error(f"❌ שגיאה בשליחה ל־{chat_id}: {response.status_code} - {response.text}")
-
+            response = _session.post(url, data=payload, timeout=SEND_TIMEOUT)
         except requests.exceptions.RequestException as e:
+            detail = f"network: {e}"
             logging.error(f"❌ שגיאת רשת בשליחה ל־{chat_id}: {e}")
+            continue
+
+        if response.status_code == 200:
+            return True, "ok"
+        if response.status_code == 429:
+            wait = _retry_after(response) or 1.0
+            bucket.pause(wait)
+            TELEGRAM_SENDS.inc("throttled")
+            detail = f"429 retry_after={wait}"
+            logging.warning(f"⏳ טלגרם ביקש להמתין {wait}s לפני שליחה ל־{chat_id}")
+            continue
+        detail = f"{response.status_code} - {response.text}"
+        logging.error(f"❌ שגיאה בשליחה ל־{chat_id}: {detail}")
+        break   # 400/403 וכו' – ניסיון חוזר לא יעזור
+    return False, detail
+
+def _send_traced(chat_id: str, message: str, trace) -> tuple[bool, str]:
+    """_send_one + סימון זמן המסירה ב-trace ברגע שהיא הושלמה (בת'רד השליחה)."""
+    ok, detail = _send_one(chat_id, message)
+    if ok and trace is not None:
+        trace.mark_delivery()
+    return ok, detail
+
+def send_to_telegram(message: str,
+                     alert_type: str | None = None,
+                     symbol: str | None = None,
+                     tier: str | None = None,
+                     price: float | None = None,
+                     trace=None) -> dict:
+    """
+    שולח הודעה בטלגרם עם עיצוב HTML – במקביל, על חיבור מאוגד אחד, בכפוף למגבלה
+    הגלובלית ולמגבלה לכל צ'אט. בלי alert_type – לכל המנויים (הודעות מערכת);
+    עם alert_type – רק למנויים שההעדפות שלהם מתאימות (alert_routing).
+    trace (alert_trace.AlertTrace, אופציונלי) – מסמן כל מסירה שהושלמה ונסגר בסוף השליחה.
+    מחזיר דו"ח מסירה: {"sent": [...], "failed": {chat_id: reason}, "elapsed_sec": float}
+    """
+    t0 = time.monotonic()
+    report = {"sent": [], "failed": {}, "elapsed_sec": 0.0}
+
+    if alert_type is None:
+        recipients = load_subscribers()
+    else:
+        recipients = subscriber_store.routing().route(alert_type, symbol, tier, price)
+    # ליתר ביטחון – כל צ'אט פעם אחת
+    subscribers = list(dict.fromkeys(str(c) for c in recipients))
+    if not subscribers:
+        if alert_type is None:
+            logging.warning("אין מנויים לשליחה.")
+        if trace is not None:
+            trace.finish()
+        return report
+
+    futures = {chat_id: _pool.submit(_send_traced, chat_id, message, trace) for chat_id in subscribers}
+    for chat_id, fut in futures.items():
+        try:
+            ok, detail = fut.result()
         except Exception as e:
+            ok, detail = False, f"unexpected: {e}"
             logging.error(f"❌ שגיאה לא צפויה בשליחה ל־{chat_id}: {e}")
+        if ok:
+            report["sent"].append(chat_id)
+        else:
+            report["failed"][chat_id] = detail
+
+    report["elapsed_sec"] = round(time.monotonic() - t0, 3)
+    if trace is not None:
+        trace.finish()
+    print(f"✅ נשלחה הודעה ל־{len(report['sent'])}/{len(subscribers)} מנויים ({report['elapsed_sec']}s)")
+    return report
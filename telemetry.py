@@ -0,0 +1,211 @@
+# telemetry.py
+# -*- coding: utf-8 -*-
+"""
+מדדי ריצה בפורמט Prometheus (text 0.0.4) – נחשפים ב-/metrics של keep_alive.
+הנתיב החם בלי מנעולים: כל ת'רד כותב ל-shard משלו (dict ב-threading.local), וה-scrape
+מסכם את כל ה-shards. מנעול נלקח רק פעם אחת לת'רד (רישום ה-shard) ובזמן scrape.
+מדדים שכבר נספרים במקום אחר (עומק תור, טריות, קאש) נאספים בזמן scrape דרך callback.
+"""
+import math
+import time
+import logging
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+_registry_lock = threading.Lock()
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v != v:
+        return "NaN"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Sharded:
+    """בסיס: shard לכל ת'רד, רשימת כל ה-shards לאיסוף."""
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._tls = threading.local()
+        self._shards: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}              # ערכים מ-threads שהסתיימו (למשל executors של סריקה)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._tls.d
+        except AttributeError:
+            d = self._tls.d = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), d))
+            return d
+
+    def _fold(self, into: dict, snap: dict):
+        raise NotImplementedError
+
+    def remove(self, *labels):
+        """
+        מוחק סדרה (למשל סימול שיצא מרשימת המעקב) מכל ה-shards – אחרת תוויות מתחלפות
+        מצטברות לכל חיי התהליך. dict.pop אטומי תחת ה-GIL; הקורא דואג שהסדרה לא תיכתב שוב.
+        """
+        with self._lock:
+            self._retired.pop(labels, None)
+            for _, d in self._shards:
+                d.pop(labels, None)
+
+    def values(self) -> dict:
+        """סיכום כל ה-shards; shards של threads מתים מתקפלים ל-_retired כדי שהרשימה לא תגדל."""
+        with self._lock:
+            alive = []
+            for t, d in self._shards:
+                if t.is_alive():
+                    alive.append((t, d))
+                else:
+                    self._fold(self._retired, d)
+            self._shards = alive
+            out: dict = {}
+            self._fold(out, self._retired)
+            shards = [d for _, d in alive]
+        for d in shards:
+            self._fold(out, d.copy())         # copy() של dict אטומי תחת ה-GIL
+        return out
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, *labels, n: float = 1.0):
+        d = self._shard()
+        d[labels] = d.get(labels, 0.0) + n
+
+    def _fold(self, into: dict, snap: dict):
+        for k, v in snap.items():
+            into[k] = into.get(k, 0.0) + v
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                for k, v in sorted(self.values().items())]
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        d = self._shard()
+        h = d.get(labels)
+        if h is None:
+            h = d[labels] = [0] * (len(self.buckets) + 1) + [0.0]   # מונים לכל bucket (+Inf), ואז sum
+        h[bisect_left(self.buckets, value)] += 1
+        h[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def _fold(self, into: dict, snap: dict):
+        for k, h in snap.items():
+            h = list(h)
+            acc = into.get(k)
+            into[k] = h if acc is None else [a + b for a, b in zip(acc, h)]
+
+    def render(self) -> list[str]:
+        lines = []
+        for k, h in sorted(self.values().items()):
+            cum = 0
+            for le, n in zip(self.buckets + (math.inf,), h[:-1]):
+                cum += n
+                le_label = 'le="%s"' % _fmt_value(le)
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le_label)} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(h[-1])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {cum}")
+        return lines
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: tuple):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(*self.labels, value=time.perf_counter() - self.t0)
+        return False
+
+class Gauge:
+    """ערך נוכחי. set() לערכים שנקבעים בקוד; fn – callback שמחזיר {labels: value} בזמן scrape."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), fn=None, kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.kind = kind          # callback שמחזיר מונה מצטבר (למשל מהקאש) נחשף כ-counter
+        self.fn = fn
+        self._values: dict = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        values = dict(self._values)
+        if self.fn is not None:
+            try:
+                values.update(self.fn() or {})
+            except Exception as e:
+                logging.error("telemetry callback %s failed: %s", self.name, e)
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                for k, v in sorted(values.items()) if v is not None]
+
+def render() -> str:
+    """כל המדדים הרשומים, בפורמט ה-text של Prometheus."""
+    with _registry_lock:
+        metrics = list(_registry)
+    out = []
+    for m in metrics:
+        lines = m.render()
+        out.append(f"# HELP {m.name} {m.help}")
+        out.append(f"# TYPE {m.name} {m.kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+# ===== המדדים של הבוט (מוגדרים כאן כדי שכל מודול יייבא את אותו אובייקט) =====
+TICKS = Counter("moneybot_ticks_total", "Trades received from the WebSocket, per symbol", ("symbol",))
+ON_MESSAGE_SECONDS = Histogram("moneybot_on_message_seconds", "on_message processing time per WebSocket frame")
+
+FINNHUB_REQUESTS = Counter("moneybot_finnhub_requests_total", "Finnhub HTTP requests by endpoint and status",
+                           ("endpoint", "status"))
+FINNHUB_SECONDS = Histogram("moneybot_finnhub_request_seconds", "Finnhub HTTP request latency (incl. limiter wait)",
+                            ("endpoint",))
+FINNHUB_THROTTLED = Counter("moneybot_finnhub_throttled_total", "Finnhub 429 responses", ("endpoint",))
+
+SCAN_STAGE_SECONDS = Histogram("moneybot_scan_stage_seconds", "Per-symbol scan stage duration", ("stage",))
+SCAN_RESULTS = Counter("moneybot_scan_candidates_total", "Scan candidates by stage and result", ("stage", "result"))
+SCAN_LAST = Gauge("moneybot_scan_last", "Last full scan: duration_sec / selected", ("field",))
+
+TELEGRAM_SECONDS = Histogram("moneybot_telegram_send_seconds", "Telegram sendMessage latency per chat (incl. rate limit)")
+TELEGRAM_SENDS = Counter("moneybot_telegram_sends_total", "Telegram deliveries by result", ("result",))
@@ -1,32 +1,74 @@
-from flask import Flask, request
-import json
-import os
+from flask import Flask, request, jsonify
 import logging
+from subscriber_store import store
+from alert_routing import ALERT_TYPES, TIERS
 
 app = Flask(__name__)
-SUBSCRIBERS_FILE = "subscribers.json"
 
-# יצירת הקובץ אם לא קיים
-if not os.path.exists(SUBSCRIBERS_FILE):
-    with open(SUBSCRIBERS_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
+# כינויים לסוגי התראות בפקודה /alerts
+ALERT_ALIASES = {
+    "full": "FULL", "headsup": "HEADS_UP", "heads-up": "HEADS_UP",
+    "vwap": "VWAP", "volume": "VOLUME", "hod": "HOD",
+}
 
-def load_subscribers():
-    """טוען מנויים מהקובץ (רשימה ריקה אם הקובץ פגום)."""
-    try:
-        with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logging.error(f"שגיאה בקריאת subscribers.json: {e}")
-        return []
+HELP_TEXT = (
+    "⚙️ העדפות התראה:\n"
+    "/tier a|b|all\n"
+    "/alerts full,headsup,vwap,volume,hod | all\n"
+    "/price 1-5 | all\n"
+    "/tickers AAPL,TSLA | all\n"
+    "/prefs – ההגדרות הנוכחיות"
+)
 
-def save_subscribers(subscribers):
-    """שומר את רשימת המנויים לקובץ."""
-    try:
-        with open(SUBSCRIBERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(subscribers, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logging.error(f"שגיאה בשמירת subscribers.json: {e}")
+def _csv_arg(arg: str, allowed: dict[str, str]) -> str | None:
+    """'a,b' → 'A,B' לפי allowed; 'all' → None (הכל). ValueError על ערך לא מוכר."""
+    if arg == "all":
+        return None
+    values = [v.strip() for v in arg.split(",") if v.strip()]
+    bad = [v for v in values if v not in allowed]
+    if not values or bad:
+        raise ValueError(", ".join(bad) or arg)
+    return ",".join(dict.fromkeys(allowed[v] for v in values))
+
+def _parse_pref_command(cmd: str, arg: str) -> dict:
+    """ממיר פקודת העדפה לשדות עבור store.set_prefs."""
+    if cmd == "/tier":
+        return {"tiers": _csv_arg(arg, {t.lower(): t for t in TIERS})}
+    if cmd == "/alerts":
+        return {"alert_types": _csv_arg(arg, ALERT_ALIASES)}
+    if cmd == "/tickers":
+        if arg == "all":
+            return {"tickers": None}
+        tickers = [t.strip().upper() for t in arg.split(",") if t.strip()]
+        if not tickers:
+            raise ValueError(arg)
+        return {"tickers": ",".join(dict.fromkeys(tickers))}
+    if cmd == "/price":
+        if arg == "all":
+            return {"min_price": None, "max_price": None}
+        lo, hi = (float(x) for x in arg.split("-", 1))
+        if lo < 0 or hi < lo:
+            raise ValueError(arg)
+        return {"min_price": lo, "max_price": hi}
+    raise ValueError(cmd)
+
+def _format_prefs(p: dict | None) -> str:
+    if not p:
+        return "לא נמצא מנוי. שלח /start"
+    price = "הכל"
+    if p.get("min_price") is not None or p.get("max_price") is not None:
+        price = f"${p.get('min_price') or 0:g}–${p.get('max_price') or 0:g}"
+    return (
+        "⚙️ ההגדרות שלך:\n"
+        f"Tier: {p.get('tiers') or 'הכל'}\n"
+        f"סוגי התראות: {p.get('alert_types') or ', '.join(ALERT_TYPES)}\n"
+        f"טווח מחיר: {price}\n"
+        f"טיקרים: {p.get('tickers') or 'הכל'}"
+    )
+
+def _reply(chat_id: str, text: str):
+    # תשובה ישירה בגוף ה-webhook – טלגרם מבצע אותה בלי קריאת API נוספת
+    return jsonify({"method": "sendMessage", "chat_id": chat_id, "text": text}), 200
 
 @app.route("/", methods=["POST"])
 def receive_update():
@@ -41,19 +83,27 @@ def receive_update():
 
         chat_id = str(message["chat"]["id"])
         text = message.get("text", "").strip().lower()
+        cmd, _, arg = text.partition(" ")
+        arg = arg.strip()
 
         if text == "/start":
-            subscribers = load_subscribers()
-            if chat_id not in subscribers:
-                subscribers.append(chat_id)
-                save_subscribers(subscribers)
+            if store.add(chat_id):
                 print(f"✅ מנוי חדש נוסף: {chat_id}")
         elif text == "/stop":
-            subscribers = load_subscribers()
-            if chat_id in subscribers:
-                subscribers.remove(chat_id)
-                save_subscribers(subscribers)
+            if store.remove(chat_id):
                 print(f"🛑 מנוי הוסר: {chat_id}")
+        elif cmd == "/prefs":
+            return _reply(chat_id, _format_prefs(store.get_prefs(chat_id)))
+        elif cmd in ("/tier", "/alerts", "/price", "/tickers"):
+            try:
+                fields = _parse_pref_command(cmd, arg)
+            except ValueError:
+                return _reply(chat_id, "❓ ערך לא תקין.\n" + HELP_TEXT)
+            if not store.set_prefs(chat_id, **fields):
+                return _reply(chat_id, "לא נמצא מנוי. שלח /start")
+            return _reply(chat_id, _format_prefs(store.get_prefs(chat_id)))
+        elif cmd == "/help":
+            return _reply(chat_id, HELP_TEXT)
 
         return "OK", 200
 
@@ -4,46 +4,88 @@ import json
 import time
 import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from collections import deque
-from websocket import WebSocketApp
 
 from telegram_service import send_to_telegram
+from alert_dispatcher import submit_alert
 from recommendation import generate_recommendation
 from news_service import get_today_news
-from config import FINNHUB_API_KEY
+from config import WS_RECORD_PATH, ALERT_LATENCY_FOOTER
 from session_time import get_session_label
+from rolling_window import RollingWindow
+from bar_aggregator import aggregator
+from ws_recorder import FrameRecorder
+from ws_manager import create_manager
+from telemetry import TICKS, ON_MESSAGE_SECONDS, Counter
+from alert_trace import AlertTrace
+from finnhub_client import get_json
 
 # ===== פרמטרים =====
 HISTORY_WINDOW = timedelta(minutes=30)  # כמה זמן לשמור היסטוריית מחירים לניטור MA(30m)
+HISTORY_CAPACITY = 16384                # תקרת דגימות לסימול (~9 שינויי מחיר/שנייה לאורך 30 דק'; ה-buffer גדל לפי הצורך)
+MERGE_SAME_SECOND = False               # True: טיקים באותה שנייה → דגימה אחת (משנה את ה-MA: ממוצע של מחיר-סוף-שנייה)
 ALERT_EXPIRY   = timedelta(hours=1)     # ניקוי מפתחות התראה ישנים
 ALERT_COOLDOWN = timedelta(minutes=5)   # קירור התראות לכל "באקט" אחוזים
-PING_INTERVAL  = 20                     # שניות (ping לשמירת החיבור חי)
-MAX_BACKOFF    = 120                    # שניות (גבול עליון לריב"ק התחברות)
 
 # טריגרים ל-Tier B (מועמדות במעקב)
 RVOL_TRIGGER_B      = 2.0              # RVOL דרוש כדי לשלוח Heads-up
 CHANGE_TRIGGER_B_HP = 4.0              # שינוי יומי מ-Open ל-Heads-up מסוג "חזק"
 CHANGE_TRIGGER_B_HI = 3.0              # שינוי יומי בעת HOD מקומי + מחיר מעל MA
 
+# השלמת פער אחרי reconnect (נרות 1ד' מ-REST)
+BACKFILL_WORKERS     = 8               # בקשות במקביל (מעליהן ה-rate limiter של finnhub_client)
+BACKFILL_TIMEOUT_SEC = 15              # תקרה לכל הסבב – מה שלא הגיע, לא מעכב את ה-subscribe
+BACKFILL_BARS = Counter("moneybot_ws_backfill_bars_total", "1m candles merged into tick state after a reconnect gap")
+
 # ===== זיכרון ריצה =====
-price_history: dict[str, deque] = {}    # {symbol: deque[(ts, price)]}
-sent_alerts: dict[str, datetime] = {}   # {key: last_sent_time}
-_last_price: dict[str, float] = {}      # {symbol: last_trade_price} – להפחתת רעש כפולים
-_local_hod: dict[str, float] = {}       # {symbol: local high-of-day מאז התחברות}
+class SymbolState:
+    """כל המצב של סימול אחד במקום אחד – חיפוש hash יחיד לכל טרייד."""
+    __slots__ = ("info", "last_price", "hod", "history", "alerts")
+
+    def __init__(self, info: dict):
+        self.info = info                      # ה-dict מהסורק (מתעדכן במקום בסריקה חוזרת)
+        self.last_price: float | None = None  # להפחתת רעש כפולים
+        self.hod: float | None = None         # local high-of-day מאז התחברות
+        self.history = RollingWindow(HISTORY_WINDOW.total_seconds(), HISTORY_CAPACITY,
+                                     merge_same_second=MERGE_SAME_SECOND)  # MA(30m) ב-O(1)
+        self.alerts: dict[str, datetime] = {} # {alert_key: last_sent_time}
+
+registry: dict[str, SymbolState] = {}   # {symbol: SymbolState}
+_last_alert_cleanup: datetime | None = None
+
+# ===== רשימת מעקב חיה (מתעדכנת ע"י סריקה חוזרת, בלי reconnect) =====
+_watchlist: list[dict] = []             # אותו אובייקט רשימה שמועבר ל-metrics
+_watch_lock = threading.Lock()
+_manager = None                         # ws_manager.WSManager (חיבורים מחולקים ל-shards)
+
+# ===== שעון והקלטה =====
+_now = datetime.now                     # ניתן להחלפה (ws_replay מריץ לפי זמני ההקלטה)
+_recorder = FrameRecorder(WS_RECORD_PATH) if WS_RECORD_PATH else None
+
+def set_clock(fn):
+    """מחליף את מקור הזמן של on_message (fn מחזיר datetime) – לשחזור דטרמיניסטי."""
+    global _now
+    _now = fn
 
 # ===== עזרים =====
 def _cleanup_old_alerts(now: datetime):
-    expired = [k for k, t in sent_alerts.items() if now - t > ALERT_EXPIRY]
-    for k in expired:
-        sent_alerts.pop(k, None)
-
-def _should_alert(key: str, now: datetime) -> bool:
-    """קירור התראות לפי מפתח ייחודי (למשל לפי סימול + באקט % שינוי + סוג-התראה)."""
-    last = sent_alerts.get(key)
+    """ניקוי מפתחות התראה ישנים – פעם בדקה, לא בכל הודעה."""
+    global _last_alert_cleanup
+    if _last_alert_cleanup and now - _last_alert_cleanup < timedelta(minutes=1):
+        return
+    _last_alert_cleanup = now
+    for st in list(registry.values()):
+        expired = [k for k, t in list(st.alerts.items()) if now - t > ALERT_EXPIRY]   # list() – shards אחרים כותבים במקביל
+        for k in expired:
+            st.alerts.pop(k, None)
+
+def _should_alert(st: SymbolState, key: str, now: datetime) -> bool:
+    """קירור התראות לפי מפתח ייחודי לסימול (באקט % שינוי + סוג-התראה)."""
+    last = st.alerts.get(key)
     if last and now - last < ALERT_COOLDOWN:
         return False
-    sent_alerts[key] = now
+    st.alerts[key] = now
     return True
 
 def _fmt_money(x):
@@ -74,7 +116,8 @@ def _build_msg(symbol: str,
                percent_change: float,
                info: dict,
                note: str,
-               tag: str | None) -> str:
+               tag: str | None,
+               trace: AlertTrace | None = None) -> str:
     arrow = "▲" if percent_change >= 0 else "▼"
     sign  = "+" if percent_change >= 0 else ""
     change_line = f"{arrow} <b>{sign}{percent_change:.2f}%</b>"
@@ -96,13 +139,19 @@ def _build_msg(symbol: str,
     footer = f"🔗 <a href='https://www.tradingview.com/symbols/{symbol}/'>גרף חי</a>  •  ⏱️ {datetime.now().strftime('%H:%M:%S')}"
 
     # חדשות
+    if trace is not None:
+        trace.mark_news_start()
     try:
         news_block = get_today_news(symbol)
     except Exception as e:
         logging.error("news fetch error for %s: %s", symbol, e)
         news_block = "📰 חדשות היום: —"
+    if trace is not None:
+        trace.mark_news()
+        if ALERT_LATENCY_FOOTER:
+            footer += f"  •  ⚡ {trace.lag_sec():.2f}s"
 
-    return (
+    msg = (
         f"{header}\n"
         f"━━━━━━━━━━━━━━━━\n"
         f"📈 <b>{symbol}</b>\n"
@@ -113,29 +162,37 @@ def _build_msg(symbol: str,
         f"\n{news_block}\n"
         f"{footer}"
     )
+    if trace is not None:
+        trace.mark_render()
+    return msg
 
-def _send_full_alert(symbol, price, open_price, avg_price, percent_change, info):
+def _send_full_alert(symbol, price, open_price, avg_price, percent_change, info, trace=None):
     try:
         recommendation = generate_recommendation(round(percent_change, 2), price, avg_price)
     except Exception as e:
         logging.error("recommendation error for %s: %s", symbol, e)
         recommendation = "—"
-    msg = _build_msg(symbol, price, open_price, avg_price, percent_change, info, note=f"🧠 {recommendation}", tag=None)
-    send_to_telegram(msg)
+    msg = _build_msg(symbol, price, open_price, avg_price, percent_change, info, note=f"🧠 {recommendation}", tag=None,
+                     trace=trace)
+    send_to_telegram(msg, alert_type="FULL", symbol=symbol, tier=info.get("tier"), price=price, trace=trace)
 
-def _send_heads_up(symbol, price, open_price, avg_price, percent_change, info, reason: str):
-    msg = _build_msg(symbol, price, open_price, avg_price, percent_change, info, note=f"⚠️ Heads-up: {reason}", tag="Heads-up")
-    send_to_telegram(msg)
+def _send_heads_up(symbol, price, open_price, avg_price, percent_change, info, reason: str, trace=None):
+    msg = _build_msg(symbol, price, open_price, avg_price, percent_change, info, note=f"⚠️ Heads-up: {reason}", tag="Heads-up",
+                     trace=trace)
+    send_to_telegram(msg, alert_type="HEADS_UP", symbol=symbol, tier=info.get("tier"), price=price, trace=trace)
 
 # ===== לוגיקת עיבוד טיקים =====
-def on_message(ws, message, symbols_info: list[dict]):
+def on_message(ws, message):
     """מטפל בהודעות נכנסות מה-WebSocket של Finnhub."""
+    t0 = time.perf_counter()
+    recv_ts = time.time()
     try:
         payload = json.loads(message)
         if "data" not in payload:
             return
 
-        now = datetime.now()
+        now = _now()
+        now_ts = now.timestamp()
         _cleanup_old_alerts(now)
 
         for item in payload["data"]:
@@ -144,47 +201,50 @@ def on_message(ws, message, symbols_info: list[dict]):
             if not symbol or price is None:
                 continue
 
-            # מציאת מידע על הסימול מהרשימה שנבנתה ע"י הסורק
-            info = next((s for s in symbols_info if s.get("symbol") == symbol), None)
-            if not info:
+            # מצב הסימול (נבנה מהרשימה של הסורק) – חיפוש O(1)
+            st = registry.get(symbol)
+            if st is None:
                 continue
+            TICKS.inc(symbol)
+            info = st.info
+            price = float(price)
+
+            # נר 1ד' חי (VWAP/Volume/HOD ב-metrics) – כל טרייד נספר, גם כפולים במחיר
+            trade_ts = item.get("t")
+            exchange_ts = trade_ts / 1000.0 if trade_ts else None   # זמן הטרייד בבורסה (t במילישניות)
+            aggregator.add_trade(symbol, exchange_ts or now_ts, price, float(item.get("v") or 0.0), recv_ts)
 
             open_price = info.get("open")
             if not open_price or open_price <= 0:
                 continue
 
             # עדכון HOD מקומי
-            prev_hod = _local_hod.get(symbol, float(price))
-            if price > prev_hod:
-                _local_hod[symbol] = float(price)
+            if st.hod is None or price > st.hod:
+                st.hod = price
 
             # סינון טיקים זהים/רועשים
-            last_p = _last_price.get(symbol)
-            if last_p is not None and abs(price - last_p) < 1e-6:
-                continue
-            _last_price[symbol] = float(price)
-
-            # היסטוריית מחיר ל-MA(30m)
-            dq = price_history.setdefault(symbol, deque())
-            dq.append((now, float(price)))
-            while dq and now - dq[0][0] > HISTORY_WINDOW:
-                dq.popleft()
-            if not dq:
+            if st.last_price is not None and abs(price - st.last_price) < 1e-6:
                 continue
+            st.last_price = price
 
-            prices = [p for _, p in dq]
-            avg_price = sum(prices) / len(prices)
-            percent_change = ((float(price) - float(open_price)) / float(open_price)) * 100.0
+            # היסטוריית מחיר ל-MA(30m) – סכום רץ, בלי לעבור על החלון
+            st.history.push(now_ts, price)
+            avg_price = st.history.mean()
+            if avg_price is None:
+                continue
+            percent_change = ((price - float(open_price)) / float(open_price)) * 100.0
 
             # מפתחות קירור לפי "באקט" אחוזים
             pct_bucket = int(percent_change)
-            full_key  = f"FULL_{symbol}_{pct_bucket}"
-            head_key  = f"HEAD_{symbol}_{pct_bucket}"
+            full_key  = f"FULL_{pct_bucket}"
+            head_key  = f"HEAD_{pct_bucket}"
 
             # ===== Tier A – התראה מלאה מיד =====
             if info.get("tier") == "A":
-                if _should_alert(full_key, now):
-                    _send_full_alert(symbol, price, open_price, avg_price, percent_change, info)
+                if _should_alert(st, full_key, now):
+                    submit_alert((symbol, "FULL"), _send_full_alert,
+                                 symbol, price, open_price, avg_price, percent_change, info,
+                                 trace=AlertTrace("FULL", symbol, exchange_ts, recv_ts))
                 continue  # ל-A אין צורך ב-Heads-up באותו באקט
 
             # ===== Tier B – Heads-up טריגרי =====
@@ -192,60 +252,127 @@ def on_message(ws, message, symbols_info: list[dict]):
 
             # 1) RVOL גבוה ושינוי חזק
             if rvol >= RVOL_TRIGGER_B and percent_change >= CHANGE_TRIGGER_B_HP:
-                if _should_alert(head_key + "_RVOL", now):
-                    _send_heads_up(symbol, price, open_price, avg_price, percent_change, info, reason="RVOL↑ ו-%Change↑")
+                if _should_alert(st, head_key + "_RVOL", now):
+                    submit_alert((symbol, "HEAD_RVOL"), _send_heads_up,
+                                 symbol, price, open_price, avg_price, percent_change, info, reason="RVOL↑ ו-%Change↑",
+                                 trace=AlertTrace("HEADS_UP", symbol, exchange_ts, recv_ts))
 
             # 2) HOD מקומי חדש + שינוי ≥ 3% + מחיר מעל MA
-            local_hod = _local_hod.get(symbol, float(price))
-            made_new_hod = abs(float(price) - float(local_hod)) < 1e-6  # זה עתה נקבע HOD
-            if made_new_hod and percent_change >= CHANGE_TRIGGER_B_HI and float(price) > float(avg_price):
-                if _should_alert(head_key + "_HOD", now):
-                    _send_heads_up(symbol, price, open_price, avg_price, percent_change, info, reason="שיא מקומי + מומנטום")
+            made_new_hod = abs(price - st.hod) < 1e-6  # זה עתה נקבע HOD
+            if made_new_hod and percent_change >= CHANGE_TRIGGER_B_HI and price > float(avg_price):
+                if _should_alert(st, head_key + "_HOD", now):
+                    submit_alert((symbol, "HEAD_HOD"), _send_heads_up,
+                                 symbol, price, open_price, avg_price, percent_change, info, reason="שיא מקומי + מומנטום",
+                                 trace=AlertTrace("HEADS_UP", symbol, exchange_ts, recv_ts))
 
     except Exception as e:
         logging.error("WebSocket message error: %s", e)
+    finally:
+        ON_MESSAGE_SECONDS.observe(value=time.perf_counter() - t0)
+
+def _sync_registry():
+    """מיישר את registry לרשימת המעקב: שומר מצב לסימולים קיימים, יוצר לחדשים, מוחק שיצאו."""
+    live = {info["symbol"]: info for info in _watchlist}
+    for sym in [s for s in registry if s not in live]:
+        del registry[sym]
+        aggregator.drop(sym)
+        TICKS.remove(sym)             # on_message סופר רק סימולים ב-registry – הסדרה לא תחזור
+    for sym, info in live.items():
+        st = registry.get(sym)
+        if st is None:
+            registry[sym] = SymbolState(info)
+        else:
+            st.info = info
+
+def current_symbols() -> list[str]:
+    with _watch_lock:
+        return [s["symbol"] for s in _watchlist]
+
+def update_watchlist(new_infos: list[dict]) -> tuple[list[str], list[str]]:
+    """
+    מחליף את רשימת המעקב "על חם": subscribe/unsubscribe על ה-shards המחוברים (עם איזון), עדכון במקום של
+    הרשימה המשותפת (גם ה-metrics poller קורא ממנה), ושימור היסטוריה/HOD לסימולים שנשארו.
+    מחזיר (added, removed).
+    """
+    with _watch_lock:
+        old = {s["symbol"]: s for s in _watchlist}
+        new_syms = [s["symbol"] for s in new_infos]
+        added = [sym for sym in new_syms if sym not in old]
+        removed = [sym for sym in old if sym not in set(new_syms)]
+
+        merged = []
+        for info in new_infos:
+            cur = old.get(info["symbol"])
+            if cur is not None:
+                cur.update(info)      # אותו dict – נתוני סריקה מתרעננים במקום
+                merged.append(cur)
+            else:
+                merged.append(info)
+        _watchlist[:] = merged
+        _sync_registry()
+        manager = _manager
+        if _recorder is not None:
+            _recorder.write_watchlist(merged)
+
+    if manager is not None:
+        manager.set_symbols(new_syms)
+    logging.info("watchlist updated: +%s -%s", added, removed)
+    return added, removed
+
+# ===== השלמת פער אחרי reconnect =====
+def _merge_candles(st: SymbolState, j: dict, gap_to: float) -> int:
+    """נרות הפער → היסטוריית ה-MA (סגירת כל נר, בסוף הדקה שלו) ו-HOD. מחזיר כמה דגימות נוספו."""
+    last = st.history.last_ts()
+    added = 0
+    for bar_t, close, high in zip(j.get("t") or [], j.get("c") or [], j.get("h") or []):
+        if st.hod is None or high > st.hod:
+            st.hod = float(high)
+        ts = min(bar_t + 59, gap_to)
+        if last is not None and ts <= last:
+            continue                      # נר שכבר כוסה בטיקים לפני הניתוק
+        st.history.push(ts, float(close))
+        last = ts
+        added += 1
+    return added
+
+def backfill_gap(symbols: list[str], gap_from: float, gap_to: float) -> int:
+    """
+    סבב אחד על כל הסימולים של ה-shard: נרות 1ד' מתחילת הדקה של הפער ועד עכשיו,
+    ממוזגים ל-SymbolState לפני שה-subscribe נשלח. מחזיר את מספר הדגימות שנוספו.
+    """
+    ts_from, ts_to = int(gap_from) // 60 * 60, int(gap_to)
+    params = {"resolution": "1", "from": ts_from, "to": ts_to}
+    pool = ThreadPoolExecutor(max_workers=max(1, min(BACKFILL_WORKERS, len(symbols))), thread_name_prefix="ws-backfill")
+    futs = {pool.submit(get_json, "/stock/candle", dict(params, symbol=sym)): sym for sym in symbols}
+    done, pending = wait(futs, timeout=BACKFILL_TIMEOUT_SEC)
+    pool.shutdown(wait=False, cancel_futures=True)
+    if pending:
+        logging.warning("backfill: %d/%d symbols timed out", len(pending), len(futs))
+
+    added = 0
+    for fut in done:
+        sym = futs[fut]
+        j = fut.result() if fut.exception() is None else None
+        st = registry.get(sym)
+        if st is None or not j or j.get("s") != "ok":
+            continue
+        added += _merge_candles(st, j, gap_to)
+    BACKFILL_BARS.inc(n=added)
+    return added
+
+def _message(ws, message):
+    if _recorder is not None:
+        _recorder.write(message)   # הפריים הגולמי, לפני כל עיבוד
+    on_message(ws, message)
 
 def start_websocket(symbols_info: list[dict]):
-    """הפעלת חיבור WebSocket לפין-האב עם ping ו-reconnect (backoff)."""
-    def on_message_wrapper(ws, message):
-        on_message(ws, message, symbols_info)
-
-    backoff = 1
-
-    def _open(ws):
-        logging.info("🔗 WebSocket opened. Subscribing...")
-        for sym in symbols_info:
-            try:
-                ws.send(json.dumps({"type": "subscribe", "symbol": sym["symbol"]}))
-                time.sleep(0.05)  # האטה כדי למנוע חניקת שרות
-            except Exception as e:
-                logging.error("subscribe error for %s: %s", sym.get("symbol"), e)
-        nonlocal backoff
-        backoff = 1
-
-    def _error(ws, err):
-        logging.error("WebSocket error: %s", err)
-
-    def _close(ws, *args):
-        logging.warning("[INFO] WebSocket closed.")
-
-    def _runner():
-        nonlocal backoff
-        while True:
-            try:
-                ws = WebSocketApp(
-                    f"wss://ws.finnhub.io?token={FINNHUB_API_KEY}",
-                    on_message=on_message_wrapper,
-                    on_open=_open,
-                    on_error=_error,
-                    on_close=_close
-                )
-                ws.run_forever(ping_interval=PING_INTERVAL, ping_timeout=PING_INTERVAL - 5)
-            except Exception as e:
-                logging.error("WebSocket crashed: %s", e)
-
-            # backoff לפני נסיון התחברות מחדש
-            time.sleep(backoff)
-            backoff = min(backoff * 2, MAX_BACKOFF)
-
-    threading.Thread(target=_runner, daemon=True).start()
+    """הפעלת חיבורי WebSocket לפין-האב (shards, ping ו-reconnect עם backoff לכל shard)."""
+    global _watchlist, _manager
+    with _watch_lock:
+        _watchlist = symbols_info
+        _sync_registry()
+        if _recorder is not None:
+            _recorder.write_watchlist(symbols_info)
+        symbols = [s["symbol"] for s in _watchlist]
+        _manager = create_manager(_message, on_reconnect=backfill_gap)
+    _manager.start(symbols)
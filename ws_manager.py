@@ -0,0 +1,209 @@
+# ws_manager.py
+# -*- coding: utf-8 -*-
+"""
+ניהול חיבורי WebSocket לפין-האב ב-shards:
+- הסימולים מחולקים בין WS_SHARDS חיבורים; לכל shard ת'רד, חיבור ו-backoff משלו –
+  socket איטי או נופל לא מעכב את השאר.
+- subscribe/unsubscribe נשלחים במנות: דלי אסימונים משותף לכל ה-shards
+  (burst של WS_SUBSCRIBE_BATCH, קצב WS_SUBSCRIBE_PER_SEC) במקום 50ms לכל סימול.
+- שינוי רשימת מעקב: סימול נשאר ב-shard שלו; חדשים נכנסים ל-shard הכי פחות עמוס,
+  ואם הפער בין shards עדיין גדול מ-1 – סימולים עוברים מהעמוס לריק (unsubscribe/subscribe).
+- reconnect: הפער מאז הפריים האחרון של ה-shard מועבר ל-on_reconnect (backfill מ-REST)
+  לפני שה-subscribe נשלח – הטיקים החיים ממשיכים רק אחרי שהחור התמלא.
+"""
+import json
+import time
+import random
+import logging
+import threading
+from websocket import WebSocketApp
+
+from config import FINNHUB_API_KEY, FINNHUB_WS_URL, WS_SHARDS, WS_SUBSCRIBE_BATCH, WS_SUBSCRIBE_PER_SEC
+from rate_limiter import TokenBucket
+from telemetry import Counter, Gauge, Histogram
+
+# ===== פרמטרים =====
+PING_INTERVAL = 20                      # שניות (ping לשמירת החיבור חי)
+MAX_BACKOFF   = 120                     # שניות (גבול עליון לריב"ק התחברות, לכל shard)
+MIN_GAP_SEC   = 5                       # פער קצר מזה לא מצדיק backfill
+GAP_BUCKETS   = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+WS_CONNECTS = Counter("moneybot_ws_connects_total", "WebSocket connections opened, per shard", ("shard",))
+WS_GAP_SECONDS = Histogram("moneybot_ws_gap_seconds", "Feed gap per shard reconnect (last frame → reopen)",
+                           buckets=GAP_BUCKETS)
+WS_BACKFILL_SECONDS = Histogram("moneybot_ws_backfill_seconds", "Reconnect backfill duration, per shard reconnect")
+
+class _Shard:
+    __slots__ = ("idx", "symbols", "ws", "backoff", "connected_at", "last_frame_at", "send_lock")
+
+    def __init__(self, idx: int):
+        self.idx = idx
+        self.symbols: dict[str, None] = {}    # dict כ-set עם סדר הכנסה (דטרמיניסטי ל-rebalance)
+        self.ws = None                        # החיבור הפתוח (None בין חיבורים)
+        self.backoff = 1
+        self.connected_at: float | None = None
+        self.last_frame_at: float | None = None   # הפריים האחרון (או סגירת החיבור) – תחילת הפער
+        self.send_lock = threading.Lock()     # מנות subscribe של shard לא מתערבבות
+
+class WSManager:
+    def __init__(self, on_message, shards: int = WS_SHARDS, url: str | None = None, on_reconnect=None):
+        """
+        on_message(ws, message) – נקרא מת'רד ה-shard (כמה ת'רדים במקביל כש-shards > 1).
+        on_reconnect(symbols, gap_from, gap_to) – נקרא מת'רד ה-shard לפני ה-subscribe, כשהיה פער.
+        """
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self.url = url or f"{FINNHUB_WS_URL}?token={FINNHUB_API_KEY}"
+        self._shards = [_Shard(i) for i in range(max(1, shards))]
+        self._where: dict[str, _Shard] = {}   # {symbol: shard}
+        self._lock = threading.Lock()
+        self._pacer = TokenBucket(WS_SUBSCRIBE_PER_SEC, WS_SUBSCRIBE_BATCH)
+        self._started = False
+
+    # ===== שיבוץ =====
+    def _assign(self, symbols: list[str]) -> tuple[dict, dict]:
+        """מיישר את השיבוץ ל-symbols (תחת _lock). מחזיר ({shard: [unsub]}, {shard: [sub]})."""
+        unsub: dict[_Shard, list[str]] = {}
+        sub: dict[_Shard, list[str]] = {}
+        wanted = dict.fromkeys(symbols)
+        for sym in [s for s in self._where if s not in wanted]:
+            sh = self._where.pop(sym)
+            del sh.symbols[sym]
+            unsub.setdefault(sh, []).append(sym)
+        for sym in wanted:
+            if sym in self._where:
+                continue
+            sh = min(self._shards, key=lambda s: len(s.symbols))
+            sh.symbols[sym] = None
+            self._where[sym] = sh
+            sub.setdefault(sh, []).append(sym)
+        # איזון: מעבירים מהעמוס ביותר לריק ביותר עד פער של 1
+        while True:
+            big = max(self._shards, key=lambda s: len(s.symbols))
+            small = min(self._shards, key=lambda s: len(s.symbols))
+            if len(big.symbols) - len(small.symbols) <= 1:
+                break
+            sym = next(reversed(big.symbols))
+            del big.symbols[sym]
+            small.symbols[sym] = None
+            self._where[sym] = small
+            if sym in sub.get(big, ()):
+                sub[big].remove(sym)          # עוד לא נשלח – פשוט נרשם ב-shard האחר
+            else:
+                unsub.setdefault(big, []).append(sym)
+            sub.setdefault(small, []).append(sym)
+        return unsub, sub
+
+    def _send(self, sh: _Shard, ws, msg_type: str, symbols: list[str]):
+        """שליחה במנות: הדלי המשותף מאפשר burst ואז מקצב – בלי sleep קבוע לכל סימול."""
+        if ws is None or not symbols:
+            return
+        t0 = time.monotonic()
+        with sh.send_lock:
+            for sym in symbols:
+                self._pacer.acquire()
+                try:
+                    ws.send(json.dumps({"type": msg_type, "symbol": sym}))
+                except Exception as e:
+                    # החיבור נפל – ה-reconnect ירשום מחדש את כל הסימולים של ה-shard
+                    logging.error("ws shard %d %s error for %s: %s", sh.idx, msg_type, sym, e)
+                    return
+        logging.info("ws shard %d: %s %d symbols in %.2fs", sh.idx, msg_type, len(symbols), time.monotonic() - t0)
+
+    def set_symbols(self, symbols: list[str]):
+        """מחליף את סט הסימולים; על shards מחוברים נשלח רק ההפרש (כולל העברות איזון)."""
+        with self._lock:
+            unsub, sub = self._assign(symbols)
+            plan = [(sh, sh.ws, "unsubscribe", syms) for sh, syms in unsub.items()]
+            plan += [(sh, sh.ws, "subscribe", syms) for sh, syms in sub.items()]
+        if not self._started:
+            return
+        # unsubscribe קודם – סימול שעבר shard לא נספר פעמיים בנר החי
+        for sh, ws, msg_type, syms in plan:
+            self._send(sh, ws, msg_type, syms)
+
+    # ===== חיבורים =====
+    def _frame(self, sh: _Shard, ws, message):
+        sh.last_frame_at = time.time()
+        self.on_message(ws, message)
+
+    def _backfill(self, sh: _Shard, symbols: list[str], gap_from: float, gap_to: float):
+        gap = gap_to - gap_from
+        WS_GAP_SECONDS.observe(value=gap)
+        if self.on_reconnect is None or gap < MIN_GAP_SEC or not symbols:
+            return
+        t0 = time.perf_counter()
+        try:
+            self.on_reconnect(symbols, gap_from, gap_to)
+        except Exception as e:
+            logging.error("ws shard %d backfill failed: %s", sh.idx, e)
+        took = time.perf_counter() - t0
+        WS_BACKFILL_SECONDS.observe(value=took)
+        logging.info("ws shard %d: gap %.1fs, backfilled %d symbols in %.2fs", sh.idx, gap, len(symbols), took)
+
+    def _open(self, sh: _Shard, ws):
+        with self._lock:
+            sh.ws = ws                        # מכאן set_symbols שולח ישירות על החיבור הזה
+            sh.connected_at = time.time()
+            symbols = list(sh.symbols)
+        gap_from = sh.last_frame_at
+        WS_CONNECTS.inc(str(sh.idx))
+        logging.info("🔗 WebSocket shard %d opened. Subscribing %d symbols...", sh.idx, len(symbols))
+        if gap_from is not None:              # לא בחיבור הראשון – אז אין "חור", רק התחלה
+            self._backfill(sh, symbols, gap_from, sh.connected_at)
+        self._send(sh, ws, "subscribe", symbols)
+        sh.backoff = 1
+
+    def _close(self, sh: _Shard, ws):
+        with self._lock:
+            if sh.ws is ws:
+                sh.ws = None
+                sh.connected_at = None
+                if sh.last_frame_at is None:
+                    sh.last_frame_at = time.time()   # נסגר לפני שהגיע פריים – הפער מתחיל כאן
+        logging.warning("[INFO] WebSocket shard %d closed.", sh.idx)
+
+    def _run(self, sh: _Shard):
+        while True:
+            try:
+                app = WebSocketApp(
+                    self.url,
+                    on_message=lambda ws, message: self._frame(sh, ws, message),
+                    on_open=lambda ws: self._open(sh, ws),
+                    on_error=lambda ws, err: logging.error("WebSocket shard %d error: %s", sh.idx, err),
+                    on_close=lambda ws, *args: self._close(sh, ws),
+                )
+                app.run_forever(ping_interval=PING_INTERVAL, ping_timeout=PING_INTERVAL - 5)
+            except Exception as e:
+                logging.error("WebSocket shard %d crashed: %s", sh.idx, e)
+
+            # backoff לכל shard בנפרד (+jitter, כדי ש-shards לא יתחברו מחדש יחד)
+            time.sleep(sh.backoff * random.uniform(1.0, 1.25))
+            sh.backoff = min(sh.backoff * 2, MAX_BACKOFF)
+
+    def start(self, symbols: list[str]):
+        with self._lock:
+            self._assign(symbols)
+            self._started = True
+        for sh in self._shards:
+            threading.Thread(target=self._run, args=(sh,), name=f"ws-shard-{sh.idx}", daemon=True).start()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [{"shard": sh.idx, "symbols": len(sh.symbols), "connected": sh.ws is not None,
+                     "backoff_sec": sh.backoff} for sh in self._shards]
+
+_managers: list[WSManager] = []
+
+def _gauge_values(field: str) -> dict:
+    return {(str(s["shard"]),): float(s[field]) for m in _managers for s in m.stats()}
+
+Gauge("moneybot_ws_shard_symbols", "Symbols subscribed per WebSocket shard", ("shard",),
+      fn=lambda: _gauge_values("symbols"))
+Gauge("moneybot_ws_shard_connected", "1 if the WebSocket shard is connected", ("shard",),
+      fn=lambda: _gauge_values("connected"))
+
+def create_manager(on_message, shards: int = WS_SHARDS, on_reconnect=None) -> WSManager:
+    m = WSManager(on_message, shards, on_reconnect=on_reconnect)
+    _managers.append(m)
+    return m
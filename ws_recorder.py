@@ -0,0 +1,80 @@
+# ws_recorder.py
+# -*- coding: utf-8 -*-
+"""
+הקלטת פריימים גולמיים מה-WebSocket של Finnhub לקובץ append-only, לשחזור מחוץ לשעות המסחר (ws_replay).
+פורמט: רצף רשומות struct("<dI") = (recv_ts כ-double, אורך כ-uint32) ואחריהן בתי ה-payload (UTF-8).
+קובץ שמסתיים ב-.gz נכתב דחוס (gzip מרובה-members – כל פתיחה מוסיפה member, הקריאה רציפה).
+רשומה חלקית בסוף הקובץ (קריסה באמצע כתיבה) נזרקת בקריאה.
+"""
+import gzip
+import json
+import time
+import atexit
+import struct
+import logging
+import threading
+
+_HEADER = struct.Struct("<dI")
+FLUSH_EVERY_SEC = 1.0
+WATCHLIST_FRAME = "_watchlist"   # פריים מטא: רשימת המעקב בזמן ההקלטה (on_message מתעלם ממנו – אין "data")
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+class FrameRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = _open(path, "ab")
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.frames = 0
+        self.bytes = 0
+        atexit.register(self.close)
+        logging.info("🎙️ recording WebSocket frames to %s", path)
+
+    def write(self, message, recv_ts: float | None = None):
+        data = message.encode("utf-8") if isinstance(message, str) else bytes(message)
+        rec = _HEADER.pack(time.time() if recv_ts is None else recv_ts, len(data))
+        with self._lock:
+            if self._f is None:
+                return
+            try:
+                self._f.write(rec)
+                self._f.write(data)
+                self.frames += 1
+                self.bytes += len(rec) + len(data)
+                now = time.monotonic()
+                if now - self._last_flush >= FLUSH_EVERY_SEC:
+                    self._f.flush()
+                    self._last_flush = now
+            except Exception as e:
+                logging.error("ws recorder write error: %s", e)
+
+    def write_watchlist(self, infos: list[dict]):
+        self.write(json.dumps({"type": WATCHLIST_FRAME, "watchlist": infos}, default=str))
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                try:
+                    self._f.close()
+                except Exception as e:
+                    logging.error("ws recorder close error: %s", e)
+                self._f = None
+
+def read_frames(path: str):
+    """מחולל של (recv_ts, message:str) לפי סדר ההקלטה."""
+    with _open(path, "rb") as f:
+        while True:
+            try:
+                head = f.read(_HEADER.size)
+                if len(head) < _HEADER.size:
+                    return
+                ts, n = _HEADER.unpack(head)
+                data = f.read(n)
+            except EOFError:          # member gzip קטוע
+                data, n = b"", 1
+            if len(data) < n:
+                logging.warning("truncated frame at end of %s – ignored", path)
+                return
+            yield ts, data.decode("utf-8", errors="replace")
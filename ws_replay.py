@@ -0,0 +1,148 @@
+# ws_replay.py
+# -*- coding: utf-8 -*-
+"""
+שחזור הקלטת WebSocket (ws_recorder) דרך websocket_handler.on_message – בלי שוק פתוח.
+טלגרם וחדשות לא נקראים: ההתראות נתפסות ב-sink במקום תור ההתראות, והשעון של on_message
+הוא זמן הקבלה המוקלט – כך שאותה הקלטה נותנת בדיוק אותן התראות בכל ריצה.
+
+    python ws_replay.py frames.bin[.gz] [--speed 1|10|0] [--tier B] [--json out.json]
+
+speed: 1 = זמן אמת, N = פי N, 0 = מהירות מקסימלית.
+"""
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+
+import websocket_handler
+from ws_recorder import read_frames, WATCHLIST_FRAME
+
+def _percentile(sorted_vals: list, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+def _reset_handler():
+    websocket_handler.registry.clear()
+    websocket_handler._watchlist[:] = []
+    websocket_handler._last_alert_cleanup = None
+
+def replay(path: str, speed: float = 0.0, tier: str = "B", limit: int | None = None) -> dict:
+    """
+    מריץ את ההקלטה ומחזיר דו"ח: frames, ticks, ticks_per_sec, latency_us (p50/p90/p99/max לפריים),
+    alerts (רשימה לפי סדר) ו-alerts_digest (sha1 – להשוואה בין ריצות).
+    אם אין בהקלטה פריים watchlist – כל סימול נכנס בטרייד הראשון שלו עם open = המחיר הראשון.
+    """
+    alerts = []
+    clock = {"ts": 0.0}
+
+    def sink(key, fn, *args, **kwargs):
+        symbol, kind = key
+        price, pct = args[1], args[4]
+        alerts.append({"ts": round(clock["ts"], 3), "symbol": symbol, "kind": kind,
+                       "price": round(price, 4), "pct": round(pct, 2)})
+        return True
+
+    originals = (websocket_handler.submit_alert, websocket_handler.send_to_telegram,
+                 websocket_handler.get_today_news, websocket_handler._now)
+    websocket_handler.submit_alert = sink
+    websocket_handler.send_to_telegram = lambda *a, **k: {"sent": 0, "failed": 0, "elapsed_sec": 0.0}
+    websocket_handler.get_today_news = lambda symbol: "📰 (replay)"
+    websocket_handler.set_clock(lambda: datetime.fromtimestamp(clock["ts"]))
+    _reset_handler()
+
+    latencies = []
+    frames = ticks = 0
+    first_ts = None
+    have_watchlist = False
+    wall0 = time.perf_counter()
+    try:
+        for ts, message in read_frames(path):
+            if limit is not None and frames >= limit:
+                break
+            try:
+                payload = json.loads(message)
+            except ValueError:
+                payload = {}
+            if payload.get("type") == WATCHLIST_FRAME:
+                websocket_handler.update_watchlist(payload.get("watchlist") or [])
+                have_watchlist = True
+                continue
+
+            data = payload.get("data") or []
+            if not have_watchlist:
+                known = {i["symbol"] for i in websocket_handler._watchlist}
+                new = [{"symbol": d["s"], "open": float(d["p"]), "tier": tier}
+                       for d in data if d.get("s") and d.get("p") is not None and d["s"] not in known]
+                if new:
+                    seen = {}
+                    for info in new:
+                        seen.setdefault(info["symbol"], info)
+                    websocket_handler.update_watchlist(list(websocket_handler._watchlist) + list(seen.values()))
+
+            if first_ts is None:
+                first_ts = ts
+            if speed > 0:
+                wait = (ts - first_ts) / speed - (time.perf_counter() - wall0)
+                if wait > 0:
+                    time.sleep(wait)
+
+            clock["ts"] = ts
+            t0 = time.perf_counter()
+            websocket_handler.on_message(None, message)
+            latencies.append(time.perf_counter() - t0)
+            frames += 1
+            ticks += len(data)
+    finally:
+        (websocket_handler.submit_alert, websocket_handler.send_to_telegram,
+         websocket_handler.get_today_news, websocket_handler._now) = originals
+
+    wall = time.perf_counter() - wall0
+    busy = sum(latencies)
+    lat = sorted(latencies)
+    digest = hashlib.sha1(json.dumps(alerts, sort_keys=True).encode("utf-8")).hexdigest()
+    by_kind = {}
+    for a in alerts:
+        by_kind[a["kind"]] = by_kind.get(a["kind"], 0) + 1
+    return {
+        "path": path,
+        "speed": speed,
+        "frames": frames,
+        "ticks": ticks,
+        "wall_sec": round(wall, 3),
+        "ticks_per_sec": round(ticks / busy, 1) if busy else None,   # תפוקת on_message נטו
+        "latency_us": {f"p{p}": round(_percentile(lat, p) * 1e6, 1) for p in (50, 90, 99)}
+                      | {"max": round(lat[-1] * 1e6, 1) if lat else 0.0},
+        "alerts_by_kind": by_kind,
+        "alerts_digest": digest,
+        "alerts": alerts,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay a recorded Finnhub WebSocket session through on_message")
+    ap.add_argument("path")
+    ap.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N×, 0 = max")
+    ap.add_argument("--tier", default="B", help="tier for symbols without a recorded watchlist")
+    ap.add_argument("--limit", type=int, default=None, help="stop after N frames")
+    ap.add_argument("--json", dest="json_out", default=None, help="write the full report here")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    report = replay(args.path, speed=args.speed, tier=args.tier, limit=args.limit)
+    print(f"frames={report['frames']} ticks={report['ticks']} wall={report['wall_sec']}s "
+          f"ticks/sec={report['ticks_per_sec']}")
+    print("latency per frame (µs): " + "  ".join(f"{k}={v}" for k, v in report["latency_us"].items()))
+    print(f"alerts: {len(report['alerts'])} {report['alerts_by_kind']} digest={report['alerts_digest'][:12]}")
+    for a in report["alerts"][:20]:
+        print("  ", a)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
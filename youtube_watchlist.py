@@ -5,21 +5,13 @@ from googleapiclient.discovery import build
 from youtube_transcript_api import YouTubeTranscriptApi
 from config import YT_API_KEY, YT_CHANNEL_IDS, YOUTUBE_LOOKBACK
 import logging
-import requests
+from symbol_universe import get_us_symbols
 
 TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
 
 def _get_us_symbols() -> Set[str]:
-    # סט סמלים חוקיים כדי לסנן ראשי תיבות רגילים
-    try:
-        from config import FINNHUB_API_KEY
-        url = f"https://finnhub.io/api/v1/stock/symbol?exchange=US&token={FINNHUB_API_KEY}"
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        return {row.get("symbol","") for row in r.json() if row.get("symbol")}
-    except Exception as e:
-        logging.error("symbol universe fetch failed: %s", e)
-        return set()
+    # סט סמלים חוקיים כדי לסנן ראשי תיבות רגילים (מתוך snapshot משותף עם הסורק)
+    return get_us_symbols()
 
 def _list_videos_for_channel(youtube, channel_id: str, max_results: int) -> List[str]:
     vids = []